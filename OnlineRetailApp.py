@@ -1,19 +1,58 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog, ttk
+import argparse
 import sqlite3
 import datetime
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
+from carts import ReservationExpiredError
+from catalog_io import parse_product
+from catalog_view import ProductCatalogView
+from checkout import InsufficientStockError
+from profiling import QueryProfiler
+from sales_chart import SalesChartRenderer, fingerprint
+from retail_db import DEFAULT_DB_PATH, RetailStore
+from ui_executor import UiExecutor
+
+SEARCH_DELAY_MS = 250
+CART_FLUSH_MS = 1000
+CART_SWEEP_MS = 60000
+STOCK_ALERT_MS = 15000
 
 
 class OnlineRetailApp:
-    def __init__(self, root):
+    def __init__(self, root, server_url=None):
         self.root = root
         self.root.title("Online Retail Application Management System")
         self.root.configure(bg="#f0f0f0")
-        self.db_init()
+        # With a server URL every operation goes through server.py and this
+        # process never opens the database
+        self.remote = server_url is not None
+        if self.remote:
+            from client import RemoteStore
+            self.profiler = None
+            self.store = RemoteStore(server_url)
+            self.analytics = self.store.analytics
+        else:
+            self.db_init()
+            # Created with the admin dashboard; it needs numpy
+            self.analytics = None
+        self.executor = UiExecutor(self.root, self.store.pool)
+        self.chart = SalesChartRenderer()
+        self.executor.add_busy_callback(self.show_loading)
+        self.status_label = None
         self.current_user = None
         self.cart = {}
+        # Cart edits not written yet, user_id -> {product_id: change}; a
+        # customer's edits are still written out, to their own cart, after
+        # they log out
+        self.cart_changes = {}
+        self.cart_flush_id = None
+        self.cart_flushing = False
+        self.order_pending = False
+        self.order_waiting_for_cart = False
+        # Sessions of customers who logged out while their last cart edits
+        # were still being written; ended once they are
+        self.logout_tokens = []
+        self.stock_alert_id = None
 
         # Center the window
         window_width = 1000
@@ -24,86 +63,51 @@ class OnlineRetailApp:
         center_y = int(screen_height/2 - window_height/2)
         self.root.geometry(f'{window_width}x{window_height}+{center_x}+{center_y}')
 
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.create_login_screen()
-        self.add_default_products()
+        if not self.remote:
+            # The server seeds and sweeps for its clients. Seeding runs after
+            # the login window is up, and is a read once the rows exist.
+            self.executor.submit(self.seed_database, on_error=self.show_db_error)
+            self.root.after(CART_SWEEP_MS, self.sweep_reservations)
 
     def db_init(self):
-        self.conn = sqlite3.connect("retail.db")
-        self.cursor = self.conn.cursor()
-
-        # Users: user_id (PK), username, password, role ('admin' or 'customer')
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT NOT NULL CHECK(role IN ('admin', 'customer'))
-            )
-        """)
-
-        # Products: product_id (PK), name, price, stock_quantity
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS products (
-                product_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                price REAL NOT NULL,
-                stock_quantity INTEGER NOT NULL
-            )
-        """)
-
-        # Orders: order_id (PK), user_id (FK), order_date, total_amount, payment_status
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS orders (
-                order_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                order_date TEXT NOT NULL,
-                total_amount REAL NOT NULL,
-                payment_status TEXT NOT NULL CHECK(payment_status IN ('paid', 'pending')),
-                FOREIGN KEY(user_id) REFERENCES users(user_id)
-            )
-        """)
-
-        # OrderItems: id (PK), order_id (FK), product_id (FK), quantity, price_each
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS order_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER NOT NULL,
-                product_id INTEGER NOT NULL,
-                quantity INTEGER NOT NULL,
-                price_each REAL NOT NULL,
-                FOREIGN KEY(order_id) REFERENCES orders(order_id),
-                FOREIGN KEY(product_id) REFERENCES products(product_id)
-            )
-        """)
-        self.conn.commit()
-
-        # Ensure admin user exists with default credentials (admin/admin123)
-        self.cursor.execute("SELECT * FROM users WHERE role='admin'")
-        admin = self.cursor.fetchone()
-        if not admin:
-            self.cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
-                                ("admin", "admin123", "admin"))
-            self.conn.commit()
+        # Statement timings feed the admin Diagnostics tab. Opening the store
+        # only migrates when the file's schema version is behind.
+        self.profiler = QueryProfiler(slow_ms=100)
+        self.store = RetailStore(DEFAULT_DB_PATH, profiler=self.profiler)
 
-    def add_default_products(self):
-        self.cursor.execute("SELECT COUNT(*) FROM products")
-        if self.cursor.fetchone()[0] == 0:
-            default_products = [
-                ("Laptop", 999.99, 50),
-                ("Smartphone", 699.99, 100),
-                ("Headphones", 149.99, 200),
-                ("Tablet", 399.99, 75),
-                ("Smartwatch", 199.99, 150)
-            ]
-            self.cursor.executemany(
-                "INSERT INTO products (name, price, stock_quantity) VALUES (?, ?, ?)",
-                default_products
-            )
-            self.conn.commit()
+    def seed_database(self):
+        self.store.users.ensure_admin()
+        self.add_default_products()
 
-    def create_login_screen(self):
+    def add_default_products(self):
+        default_products = [
+            ("Laptop", 999.99, 50),
+            ("Smartphone", 699.99, 100),
+            ("Headphones", 149.99, 200),
+            ("Tablet", 399.99, 75),
+            ("Smartwatch", 199.99, 150)
+        ]
+        self.store.products.add_defaults(default_products)
+
+    def clear_screen(self):
+        # Leaving a screen: drop its pending reads, then rebuild from scratch
+        self.executor.cancel_group("screen")
         for widget in self.root.winfo_children():
             widget.destroy()
+        # Loading indicator, overlaid in the bottom-right corner of every screen
+        self.status_label = tk.Label(self.root, text="", bg="#f0f0f0", fg="#555555")
+        self.status_label.place(relx=1.0, rely=1.0, anchor=tk.SE)
+        self.show_loading(self.executor.busy())
+
+    def show_loading(self, count):
+        self.root.configure(cursor="watch" if count else "")
+        if self.status_label is not None and self.status_label.winfo_exists():
+            self.status_label.configure(text="Loading..." if count else "")
+
+    def create_login_screen(self):
+        self.clear_screen()
         self.root.geometry("350x200")
         self.root.configure(bg="#f0f0f0")
 
@@ -132,8 +136,7 @@ class OnlineRetailApp:
         tk.Button(self.root, text="Logout", command=self.logout, bg="#ff6666").pack(pady=5)
 
     def create_register_screen(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
+        self.clear_screen()
         self.root.geometry("350x240")
         self.root.configure(bg="#f0f0f0")
 
@@ -171,16 +174,21 @@ class OnlineRetailApp:
             messagebox.showerror("Error", "Please enter both username and password.")
             return
 
-        self.cursor.execute("SELECT user_id, role, password FROM users WHERE username=?", (username,))
-        row = self.cursor.fetchone()
-        if row and row[2] == password:
-            self.current_user = {"user_id": row[0], "username": username, "role": row[1]}
-            if row[1] == "admin":
-                self.create_admin_dashboard()
+        # Password hashing takes tens of milliseconds: verify off the Tk thread
+        def on_user(user):
+            if user is not None:
+                self.current_user = user
+                if user["role"] == "admin":
+                    self.create_admin_dashboard()
+                else:
+                    self.create_customer_dashboard()
             else:
-                self.create_customer_dashboard()
-        else:
-            messagebox.showerror("Error", "Invalid username or password.")
+                messagebox.showerror("Error", "Invalid username or password.")
+        self.executor.submit(self.store.auth.login, username, password,
+                             on_success=on_user, on_error=self.show_db_error, group="screen")
+
+    def show_db_error(self, error):
+        messagebox.showerror("Error", f"Database error: {error}")
 
     def register_customer(self):
         username = self.reg_username.get().strip()
@@ -193,19 +201,21 @@ class OnlineRetailApp:
         if password != confirm_password:
             messagebox.showerror("Error", "Passwords do not match.")
             return
-        try:
-            self.cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
-                                (username, password, "customer"))
-            self.conn.commit()
+        def on_registered(user_id):
             messagebox.showinfo("Success", "Registration successful! Please login.")
             self.create_login_screen()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "Username already exists. Choose another.")
+
+        def on_error(error):
+            if isinstance(error, sqlite3.IntegrityError):
+                messagebox.showerror("Error", "Username already exists. Choose another.")
+            else:
+                self.show_db_error(error)
+        self.executor.submit(self.store.auth.register, username, password, "customer",
+                             on_success=on_registered, on_error=on_error)
 
     def create_customer_dashboard(self):
         self.cart = {}
-        for widget in self.root.winfo_children():
-            widget.destroy()
+        self.clear_screen()
         self.root.geometry("1000x600")
         self.root.configure(bg="#f0f0f0")
 
@@ -213,14 +223,17 @@ class OnlineRetailApp:
         header_frame.pack(fill=tk.X, pady=5)
         tk.Label(header_frame, text=f"Welcome, {self.current_user['username']} (Customer)", 
                 font=("Arial", 14), bg="#f0f0f0").pack(side=tk.LEFT, padx=10)
-        btn_back = tk.Button(header_frame, text="Back", command=self.create_login_screen, bg="#ffcc99")
+        btn_back = tk.Button(header_frame, text="Back", command=self.leave_customer_dashboard, bg="#ffcc99")
         btn_back.pack(side=tk.RIGHT, padx=5)
         btn_logout = tk.Button(header_frame, text="Logout", command=self.logout, bg="#ff6666")
         btn_logout.pack(side=tk.RIGHT, padx=5)
 
-        # Main content frame
-        main_frame = tk.Frame(self.root, bg="#f0f0f0")
-        main_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+        customer_tabs = ttk.Notebook(self.root)
+        customer_tabs.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        # Tab 1: catalog and cart
+        main_frame = tk.Frame(customer_tabs, bg="#f0f0f0")
+        customer_tabs.add(main_frame, text="Shop")
 
         # Product list frame
         product_frame = tk.Frame(main_frame, bg="#e6f2ff", bd=2, relief=tk.GROOVE)
@@ -228,14 +241,20 @@ class OnlineRetailApp:
 
         tk.Label(product_frame, text="Available Products", font=("Arial", 12), bg="#e6f2ff").pack()
 
-        self.product_tree = ttk.Treeview(product_frame, columns=("name", "price", "stock"), show="headings", height=20)
-        self.product_tree.heading("name", text="Product Name")
-        self.product_tree.heading("price", text="Price")
-        self.product_tree.heading("stock", text="In Stock")
-        self.product_tree.column("name", width=200, anchor=tk.W)
-        self.product_tree.column("price", width=100, anchor=tk.CENTER)
-        self.product_tree.column("stock", width=100, anchor=tk.CENTER)
-        self.product_tree.pack(fill=tk.BOTH, expand=True)
+        # Search box: filters the catalog as the user types
+        search_frame = tk.Frame(product_frame, bg="#e6f2ff")
+        search_frame.pack(fill=tk.X, pady=5)
+        tk.Label(search_frame, text="Search", bg="#e6f2ff").pack(side=tk.LEFT, padx=5)
+        self.search_var = tk.StringVar()
+        search_entry = tk.Entry(search_frame, textvariable=self.search_var)
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        search_entry.bind("<KeyRelease>", self.on_search_key)
+        self.search_after_id = None
+        self.search_task = None
+
+        self.catalog_view = ProductCatalogView(product_frame, self.store.catalog, executor=self.executor,
+                                               group="screen", on_error=self.show_db_error)
+        self.product_tree = self.catalog_view.tree
 
         self.product_tree.bind("<Double-1>", self.add_product_to_cart_dialog)
 
@@ -263,43 +282,127 @@ class OnlineRetailApp:
         tk.Button(btn_frame, text="Remove Selected Item", command=self.remove_selected_cart_item, bg="#ff9999").pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="Place Order & Pay", command=self.place_order, bg="#99ff99").pack(side=tk.LEFT, padx=5)
 
+        # Tab 2: past orders, newest first, a page at a time. Read the first
+        # time the tab is shown.
+        history_tab = ttk.Frame(customer_tabs)
+        customer_tabs.add(history_tab, text="Order History")
+        self.history_tree = ttk.Treeview(history_tab, columns=("date", "quantity", "amount", "status"),
+                                         show="tree headings", height=18)
+        self.history_tree.heading("#0", text="Order / Product")
+        self.history_tree.heading("date", text="Date")
+        self.history_tree.heading("quantity", text="Quantity")
+        self.history_tree.heading("amount", text="Amount")
+        self.history_tree.heading("status", text="Payment")
+        self.history_tree.column("#0", width=250, anchor=tk.W)
+        self.history_tree.column("date", width=160, anchor=tk.CENTER)
+        self.history_tree.column("quantity", width=80, anchor=tk.CENTER)
+        self.history_tree.column("amount", width=100, anchor=tk.CENTER)
+        self.history_tree.column("status", width=80, anchor=tk.CENTER)
+        self.history_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        history_buttons = tk.Frame(history_tab)
+        history_buttons.pack(pady=5)
+        self.btn_more_orders = tk.Button(history_buttons, text="Load More", state=tk.DISABLED,
+                                         command=lambda: self.load_order_history(reset=False), bg="#99ccff")
+        self.btn_more_orders.pack(side=tk.LEFT, padx=5)
+        tk.Button(history_buttons, text="Refresh", command=self.load_order_history,
+                  bg="#99ccff").pack(side=tk.LEFT, padx=5)
+        self.history_cursor = None
+        self.history_stale = True
+        customer_tabs.bind("<<NotebookTabChanged>>", lambda event: self.on_customer_tab(customer_tabs, history_tab))
+
         self.load_products()
+        self.load_server_cart()
+
+    def on_customer_tab(self, tabs, history_tab):
+        if tabs.select() == str(history_tab) and self.history_stale:
+            self.load_order_history()
+
+    def load_order_history(self, reset=True):
+        self.history_stale = False
+        self.btn_more_orders.config(state=tk.DISABLED)
+        self.executor.submit(self.store.orders.order_history, self.current_user["user_id"],
+                             None if reset else self.history_cursor,
+                             on_success=lambda result: self.show_order_history(result, reset),
+                             on_error=self.show_db_error, group="screen")
+
+    def show_order_history(self, result, reset):
+        orders, self.history_cursor = result
+        if reset:
+            for row in self.history_tree.get_children():
+                self.history_tree.delete(row)
+        for order_id, order_date, total_amount, status, lines in orders:
+            parent = self.history_tree.insert("", tk.END, iid=f"order-{order_id}", text=f"Order #{order_id}",
+                                              values=(order_date, sum(line[2] for line in lines),
+                                                      f"${total_amount:.2f}", status))
+            for product_id, name, quantity, price_each in lines:
+                self.history_tree.insert(parent, tk.END, text=name,
+                                         values=("", quantity, f"${quantity * price_each:.2f}", ""))
+        if reset and not orders:
+            self.history_tree.insert("", tk.END, text="No orders yet")
+        self.btn_more_orders.config(state=tk.NORMAL if self.history_cursor is not None else tk.DISABLED)
 
     def load_products(self):
-        for row in self.product_tree.get_children():
-            self.product_tree.delete(row)
-        self.cursor.execute("SELECT product_id, name, price, stock_quantity FROM products")
-        for product_id, name, price, stock in self.cursor.fetchall():
-            self.product_tree.insert("", tk.END, iid=str(product_id), 
-                                  values=(name, f"${price:.2f}", stock))
+        self.catalog_view.reload()
+
+    def on_search_key(self, event):
+        # Debounce: only search once typing pauses for SEARCH_DELAY_MS
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DELAY_MS, self.run_search)
+
+    def run_search(self):
+        self.search_after_id = None
+        text = self.search_var.get().strip()
+        # A newer keystroke supersedes any search still running
+        if self.search_task is not None:
+            self.search_task.cancel()
+            self.search_task = None
+        if not text:
+            self.load_products()
+            return
+        self.search_task = self.executor.submit(self.search_products, text,
+                                                on_success=self.catalog_view.show_rows,
+                                                on_error=self.show_db_error, group="screen")
+
+    def search_products(self, text):
+        # Runs on the executor; results are kept so adding one to the cart
+        # is served from memory
+        rows = self.store.search.search(text)
+        self.store.catalog.remember(rows)
+        return rows
 
     def add_product_to_cart_dialog(self, event):
         selected_item = self.product_tree.focus()
         if not selected_item:
             return
-        product_id = int(selected_item)
-        item_data = self.product_tree.item(selected_item)
-        name = item_data['values'][0]
-        price = float(item_data['values'][1].replace('$', ''))
-        stock = int(item_data['values'][2])
-        
-        if stock <= 0:
+        # Name, price and stock come from the catalog cache, not from the
+        # formatted Treeview values
+        self.executor.submit(self.store.catalog.get, int(selected_item),
+                             on_success=self.ask_cart_quantity, on_error=self.show_db_error, group="screen")
+
+    def ask_cart_quantity(self, product):
+        if product is None:
+            messagebox.showinfo("Not Found", "This product is no longer available.")
+            return
+        product_id, name, price, stock = product
+        item = self.cart.get(product_id)
+        in_cart = item["quantity"] if item else 0
+        # Catalog stock excludes what this cart already holds
+        available = stock + (item["reserved"] if item else 0)
+
+        if available - in_cart <= 0:
             messagebox.showinfo("Out of Stock", f"The product '{name}' is out of stock.")
             return
 
-        quantity = simpledialog.askinteger("Quantity", f"Enter quantity for '{name}' (max {stock}):", 
-                                          minvalue=1, maxvalue=stock)
+        quantity = simpledialog.askinteger("Quantity", f"Enter quantity for '{name}' (max {available - in_cart}):", 
+                                          minvalue=1, maxvalue=available - in_cart)
         if quantity is None:
             return
 
-        if product_id in self.cart:
-            new_qty = self.cart[product_id]["quantity"] + quantity
-            if new_qty > stock:
-                messagebox.showerror("Error", "Quantity exceeds available stock.")
-                return
-            self.cart[product_id]["quantity"] = new_qty
-        else:
-            self.cart[product_id] = {"name": name, "price": price, "quantity": quantity}
+        if item is None:
+            item = self.cart[product_id] = {"name": name, "price": price, "quantity": 0, "reserved": 0}
+        item["quantity"] = in_cart + quantity
+        self.queue_cart_change(product_id, item["name"], item["price"], item["quantity"])
         self.load_cart()
 
     def load_cart(self):
@@ -318,54 +421,158 @@ class OnlineRetailApp:
             return
         pid = int(selected)
         if pid in self.cart:
-            del self.cart[pid]
+            item = self.cart.pop(pid)
+            self.queue_cart_change(pid, item["name"], item["price"], 0)
             self.load_cart()
 
+    # The cart lives in the carts/cart_items tables and its lines hold stock.
+    # Edits are collected in cart_changes, per customer, and written as one
+    # batch CART_FLUSH_MS after the first of them, with at most one batch in
+    # flight.
+
+    def load_server_cart(self):
+        self.executor.submit(self.store.carts.get_cart, self.current_user["user_id"],
+                             on_success=self.show_server_cart, on_error=self.show_db_error, group="screen")
+
+    def show_server_cart(self, lines):
+        if not self.cart_tree.winfo_exists():
+            return
+        self.cart = {pid: {"name": name, "price": price, "quantity": quantity, "reserved": quantity}
+                     for pid, name, quantity, price, _reserved_until in lines}
+        # Edits not written yet still win
+        for pid, change in self.cart_changes.get(self.current_user["user_id"], {}).items():
+            if change["quantity"] == 0:
+                self.cart.pop(pid, None)
+            else:
+                item = self.cart.setdefault(pid, dict(change, reserved=0))
+                item["quantity"] = change["quantity"]
+        self.load_cart()
+
+    def queue_cart_change(self, product_id, name, price, quantity):
+        self.cart_changes.setdefault(self.current_user["user_id"], {})[product_id] = {
+            "name": name, "price": price, "quantity": quantity}
+        if self.cart_flush_id is None:
+            self.cart_flush_id = self.root.after(CART_FLUSH_MS, self.flush_cart)
+
+    def flush_cart(self):
+        if self.cart_flush_id is not None:
+            self.root.after_cancel(self.cart_flush_id)
+            self.cart_flush_id = None
+        if self.cart_flushing or not self.cart_changes:
+            return
+        # One customer's edits per batch, written to that customer's cart
+        owner = next(iter(self.cart_changes))
+        changes = self.cart_changes.pop(owner)
+        self.cart_flushing = True
+
+        def on_saved(rejected):
+            self.cart_flushing = False
+            if rejected and self.current_user is not None and self.current_user["user_id"] == owner:
+                messagebox.showerror("Error", "Not enough stock for:\n" + "\n".join(
+                    f"'{changes[pid]['name']}' (available: {available})" for pid, available in rejected.items()))
+            self.cart_synced(list(changes))
+
+        def on_error(error):
+            self.cart_flushing = False
+            self.show_db_error(error)
+            self.cart_synced(list(changes))
+        # Without a group: a cart write is never cancelled by leaving the screen
+        self.executor.submit(self.store.carts.apply, owner,
+                             {pid: change["quantity"] for pid, change in changes.items()},
+                             on_success=on_saved, on_error=on_error)
+
+    def cart_synced(self, product_ids):
+        if self.order_pending and self.order_waiting_for_cart:
+            self.order_waiting_for_cart = False
+            self.submit_order()
+        elif self.cart_changes and self.logout_tokens:
+            self.flush_cart()
+        elif self.cart_changes and self.cart_flush_id is None:
+            self.cart_flush_id = self.root.after(CART_FLUSH_MS, self.flush_cart)
+        if self.logout_tokens and not self.cart_flushing:
+            for token in self.logout_tokens:
+                self.executor.submit(self.store.auth.logout, token)
+            self.logout_tokens = []
+        if self.current_user is not None and self.cart_tree.winfo_exists():
+            self.load_server_cart()
+            self.catalog_view.refresh_rows(product_ids)
+
     def place_order(self):
         if not self.cart:
             messagebox.showerror("Error", "Your cart is empty.")
             return
-
-        # Check stock availability again before placing order
-        for pid, item in self.cart.items():
-            self.cursor.execute("SELECT stock_quantity FROM products WHERE product_id=?", (pid,))
-            stock = self.cursor.fetchone()[0]
-            if item["quantity"] > stock:
-                messagebox.showerror("Error", f"Insufficient stock for '{item['name']}'. Available: {stock}")
-                return
+        if self.order_pending:
+            return
 
         total_amount = sum(item["price"] * item["quantity"] for item in self.cart.values())
         confirm = messagebox.askyesno("Confirm Order", f"Total amount: ${total_amount:.2f}\nProceed to pay?")
         if not confirm:
             return
 
-        # Insert order
-        order_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.cursor.execute(
-            "INSERT INTO orders (user_id, order_date, total_amount, payment_status) VALUES (?, ?, ?, ?)",
-            (self.current_user["user_id"], order_date, total_amount, "paid"))
-        order_id = self.cursor.lastrowid
+        self.order_pending = True
+        if self.cart_flushing:
+            # Place it once the batch being written has landed
+            self.order_waiting_for_cart = True
+        else:
+            self.submit_order()
+
+    def submit_order(self):
+        # The stock is already held by the cart, so this only converts it to
+        # an order, together with any edits not written yet. Submitted
+        # without a group: an order in flight is never cancelled.
+        cart = {pid: dict(item) for pid, item in self.cart.items()}
+        changes = self.cart_changes.pop(self.current_user["user_id"], {})
+        if self.cart_flush_id is not None and not self.cart_changes:
+            self.root.after_cancel(self.cart_flush_id)
+            self.cart_flush_id = None
+
+        def on_placed(order_id):
+            self.order_pending = False
+            messagebox.showinfo("Success", "Order placed and payment done successfully!")
+            if self.cart_tree.winfo_exists():
+                self.cart = {}
+                self.load_cart()
+                self.catalog_view.refresh_rows(list(cart))
+                self.history_stale = True
+
+        def on_error(error):
+            self.order_pending = False
+            if isinstance(error, InsufficientStockError):
+                name = cart.get(error.product_id, changes.get(error.product_id, {})).get("name", "product")
+                messagebox.showerror("Error", f"Insufficient stock for '{name}'. Available: {error.available}")
+            elif isinstance(error, ReservationExpiredError):
+                messagebox.showerror("Error", "Some items in your cart were held too long and released. "
+                                              "Please review your cart.")
+            else:
+                self.show_db_error(error)
+            if self.cart_tree.winfo_exists():
+                self.load_server_cart()
+                self.catalog_view.refresh_rows(list(set(cart) | set(changes)))
+        self.executor.submit(
+            self.store.carts.checkout, self.current_user["user_id"],
+            {pid: change["quantity"] for pid, change in changes.items()},
+            expected={pid: item["quantity"] for pid, item in cart.items()},
+            on_success=on_placed, on_error=on_error)
+
+    def leave_customer_dashboard(self):
+        self.flush_cart()
+        self.create_login_screen()
 
-        # Insert order items and update stock
-        for pid, item in self.cart.items():
-            self.cursor.execute(
-                "INSERT INTO order_items (order_id, product_id, quantity, price_each) VALUES (?, ?, ?, ?)",
-                (order_id, pid, item["quantity"], item["price"])
-            )
-            self.cursor.execute(
-                "UPDATE products SET stock_quantity = stock_quantity - ? WHERE product_id = ?",
-                (item["quantity"], pid)
-            )
-
-        self.conn.commit()
-        messagebox.showinfo("Success", "Order placed and payment done successfully!")
-        self.cart = {}
-        self.load_cart()
-        self.load_products()
+    def sweep_reservations(self):
+        # Hand back stock held by carts whose reservation lapsed
+        self.executor.submit(self.store.carts.release_expired, on_error=self.show_db_error)
+        self.root.after(CART_SWEEP_MS, self.sweep_reservations)
 
     def create_admin_dashboard(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
+        # The plotting stack is only needed from here on; importing it at
+        # startup would make up most of the time to the login window
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+        from analytics import GRANULARITIES, AnalyticsEngine
+        if self.analytics is None:
+            self.analytics = AnalyticsEngine(self.store.pool)
+
+        self.clear_screen()
         self.root.geometry("1000x600")
         self.root.configure(bg="#f0f0f0")
 
@@ -426,99 +633,306 @@ class OnlineRetailApp:
                               command=self.load_statistics, bg="#99ccff")
         btn_refresh.pack(pady=5)
 
-        # Initialize graph
-        self.figure = Figure(figsize=(8, 4), dpi=100)
-        self.plot = self.figure.add_subplot(111)
-        self.canvas = FigureCanvasTkAgg(self.figure, master=graph_frame)
-        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        # Graph: drawn off the Tk thread into an image (SalesChartRenderer)
+        self.stats_image = tk.Label(graph_frame, bg="white")
+        self.stats_image.pack(fill=tk.BOTH, expand=True)
+        self.stats_photo = None
+        # Fingerprints of what the table and the image currently show
+        self.stats_key = None
+        self.chart_key = None
+
+        # Tab 3: Sales trends over a date range
+        trends_tab = ttk.Frame(tab_control)
+        tab_control.add(trends_tab, text="Sales Trends")
+
+        controls = tk.Frame(trends_tab)
+        controls.pack(fill=tk.X, padx=10, pady=5)
+        today = datetime.date.today()
+        tk.Label(controls, text="From (YYYY-MM-DD)").pack(side=tk.LEFT)
+        self.trend_start = tk.Entry(controls, width=12)
+        self.trend_start.insert(0, (today - datetime.timedelta(days=89)).isoformat())
+        self.trend_start.pack(side=tk.LEFT, padx=5)
+        tk.Label(controls, text="To").pack(side=tk.LEFT)
+        self.trend_end = tk.Entry(controls, width=12)
+        self.trend_end.insert(0, today.isoformat())
+        self.trend_end.pack(side=tk.LEFT, padx=5)
+        tk.Label(controls, text="Group by").pack(side=tk.LEFT)
+        self.trend_granularity = ttk.Combobox(controls, values=GRANULARITIES, width=8, state="readonly")
+        self.trend_granularity.set("day")
+        self.trend_granularity.pack(side=tk.LEFT, padx=5)
+        tk.Label(controls, text="Moving avg").pack(side=tk.LEFT)
+        self.trend_window = tk.Spinbox(controls, from_=1, to=90, width=4)
+        self.trend_window.delete(0, tk.END)
+        self.trend_window.insert(0, "7")
+        self.trend_window.pack(side=tk.LEFT, padx=5)
+        tk.Button(controls, text="Show Trends", command=self.load_trends, bg="#99ccff").pack(side=tk.LEFT, padx=5)
+
+        trend_graph_frame = tk.Frame(trends_tab)
+        trend_graph_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.trend_figure = Figure(figsize=(8, 3), dpi=100)
+        self.trend_plot = self.trend_figure.add_subplot(111)
+        self.trend_canvas = FigureCanvasTkAgg(self.trend_figure, master=trend_graph_frame)
+        self.trend_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+        self.top_tree = ttk.Treeview(trends_tab, columns=("name", "units", "revenue"), show="headings", height=6)
+        self.top_tree.heading("name", text="Top Products")
+        self.top_tree.heading("units", text="Units Sold")
+        self.top_tree.heading("revenue", text="Revenue ($)")
+        self.top_tree.column("name", width=250, anchor=tk.W)
+        self.top_tree.column("units", width=100, anchor=tk.CENTER)
+        self.top_tree.column("revenue", width=120, anchor=tk.CENTER)
+        self.top_tree.pack(fill=tk.X, padx=10, pady=5)
+
+        # Tab 4: Products at or below their low-stock threshold
+        inventory_tab = ttk.Frame(tab_control)
+        tab_control.add(inventory_tab, text="Low Stock")
+
+        inventory_controls = tk.Frame(inventory_tab)
+        inventory_controls.pack(fill=tk.X, padx=10, pady=5)
+        tk.Label(inventory_controls, text="Quantity").pack(side=tk.LEFT)
+        self.restock_quantity = tk.Entry(inventory_controls, width=8)
+        self.restock_quantity.pack(side=tk.LEFT, padx=5)
+        tk.Button(inventory_controls, text="Restock Selected", command=self.restock_selected,
+                  bg="#99ff99").pack(side=tk.LEFT, padx=5)
+        tk.Label(inventory_controls, text="Threshold").pack(side=tk.LEFT, padx=(20, 0))
+        self.alert_threshold = tk.Entry(inventory_controls, width=8)
+        self.alert_threshold.pack(side=tk.LEFT, padx=5)
+        tk.Button(inventory_controls, text="Set Threshold", command=self.set_selected_threshold,
+                  bg="#99ccff").pack(side=tk.LEFT, padx=5)
+        self.alert_count_label = tk.Label(inventory_controls, text="")
+        self.alert_count_label.pack(side=tk.RIGHT, padx=10)
+
+        self.alert_tree = ttk.Treeview(inventory_tab, columns=("name", "stock", "threshold"),
+                                       show="headings", selectmode="extended")
+        self.alert_tree.heading("name", text="Product")
+        self.alert_tree.heading("stock", text="In Stock")
+        self.alert_tree.heading("threshold", text="Alert At")
+        self.alert_tree.column("name", width=300, anchor=tk.W)
+        self.alert_tree.column("stock", width=100, anchor=tk.CENTER)
+        self.alert_tree.column("threshold", width=100, anchor=tk.CENTER)
+        self.alert_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        if self.profiler is not None:
+            self.create_diagnostics_tab(tab_control)
+
+        if self.stock_alert_id is not None:
+            self.root.after_cancel(self.stock_alert_id)
+        self.poll_stock_alerts()
 
         self.load_statistics()
 
+    def create_diagnostics_tab(self, tab_control):
+        # Tab 5: Statement timings and slow queries from the profiler
+        diagnostics_tab = ttk.Frame(tab_control)
+        tab_control.add(diagnostics_tab, text="Diagnostics")
+
+        diag_controls = tk.Frame(diagnostics_tab)
+        diag_controls.pack(fill=tk.X, padx=10, pady=5)
+        tk.Button(diag_controls, text="Refresh", command=self.show_diagnostics, bg="#99ccff").pack(side=tk.LEFT, padx=5)
+        tk.Button(diag_controls, text="Reset", command=self.reset_diagnostics, bg="#ff9999").pack(side=tk.LEFT, padx=5)
+        tk.Label(diag_controls, text=f"Slow query threshold: {self.profiler.slow_ms} ms").pack(side=tk.LEFT, padx=10)
+
+        columns = ("calls", "total", "mean", "p95", "max", "rows", "statement")
+        self.diag_tree = ttk.Treeview(diagnostics_tab, columns=columns, show="headings", height=10)
+        for column, title, width in (("calls", "Calls", 60), ("total", "Total (ms)", 90), ("mean", "Mean (ms)", 80),
+                                     ("p95", "p95 (ms)", 80), ("max", "Max (ms)", 80), ("rows", "Rows", 80),
+                                     ("statement", "Statement", 500)):
+            self.diag_tree.heading(column, text=title)
+            self.diag_tree.column(column, width=width, anchor=tk.W if column == "statement" else tk.CENTER)
+        self.diag_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        self.slow_text = tk.Text(diagnostics_tab, height=8, wrap=tk.NONE)
+        self.slow_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.show_diagnostics()
+
     def admin_add_product(self):
-        name = self.admin_prod_name.get().strip()
-        price_str = self.admin_prod_price.get().strip()
-        stock_str = self.admin_prod_stock.get().strip()
+        try:
+            name, price, stock = parse_product(self.admin_prod_name.get(), self.admin_prod_price.get(),
+                                               self.admin_prod_stock.get())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
 
-        if not name or not price_str or not stock_str:
-            messagebox.showerror("Error", "Please enter product name, price and stock quantity.")
+        def on_added(product_id):
+            messagebox.showinfo("Success", f"Product '{name}' added successfully!")
+            if self.admin_prod_name.winfo_exists():
+                self.admin_prod_name.delete(0, tk.END)
+                self.admin_prod_price.delete(0, tk.END)
+                self.admin_prod_stock.delete(0, tk.END)
+        self.executor.submit(self.store.products.add, name, price, stock,
+                             on_success=on_added, on_error=self.show_db_error)
+
+    def poll_stock_alerts(self):
+        # Runs while the admin dashboard is open
+        self.stock_alert_id = None
+        if not self.alert_tree.winfo_exists():
             return
+        self.executor.submit(self.store.stock_alerts.poll, on_success=self.show_stock_alerts,
+                             on_error=self.show_db_error, group="screen")
+        self.stock_alert_id = self.root.after(STOCK_ALERT_MS, self.poll_stock_alerts)
+
+    def show_stock_alerts(self, alerts):
+        selected = set(self.alert_tree.selection())
+        for row in self.alert_tree.get_children():
+            self.alert_tree.delete(row)
+        for product_id, name, stock, threshold in alerts:
+            self.alert_tree.insert("", tk.END, iid=str(product_id), values=(name, stock, threshold))
+        self.alert_tree.selection_set([iid for iid in selected if self.alert_tree.exists(iid)])
+        self.alert_count_label.config(text=f"{len(alerts)} products low on stock",
+                                      fg="#cc0000" if alerts else "#000000")
+
+    def restock_selected(self):
+        product_ids = [int(iid) for iid in self.alert_tree.selection()]
         try:
-            price = float(price_str)
-            stock = int(stock_str)
-            if price < 0 or stock < 0:
-                raise ValueError
+            quantity = int(self.restock_quantity.get())
         except ValueError:
-            messagebox.showerror("Error", "Price must be positive number and stock must be a positive integer.")
+            quantity = 0
+        if not product_ids or quantity <= 0:
+            messagebox.showerror("Error", "Select products and enter a positive quantity to restock.")
             return
 
-        self.cursor.execute(
-            "INSERT INTO products (name, price, stock_quantity) VALUES (?, ?, ?)",
-            (name, price, stock)
-        )
-        self.conn.commit()
-        messagebox.showinfo("Success", f"Product '{name}' added successfully!")
-        self.admin_prod_name.delete(0, tk.END)
-        self.admin_prod_price.delete(0, tk.END)
-        self.admin_prod_stock.delete(0, tk.END)
+        def on_restocked(rejected):
+            if rejected:
+                messagebox.showwarning("Restock", f"{len(rejected)} products could not be restocked.")
+            if self.restock_quantity.winfo_exists():
+                self.restock_quantity.delete(0, tk.END)
+                self.poll_stock_alerts_now()
+        self.executor.submit(self.store.inventory.replenish, {pid: quantity for pid in product_ids},
+                             on_success=on_restocked, on_error=self.show_db_error)
+
+    def set_selected_threshold(self):
+        product_ids = [int(iid) for iid in self.alert_tree.selection()]
+        try:
+            threshold = int(self.alert_threshold.get())
+        except ValueError:
+            threshold = -1
+        if not product_ids or threshold < 0:
+            messagebox.showerror("Error", "Select products and enter a threshold of 0 or more.")
+            return
+        self.executor.submit(self.store.inventory.set_thresholds, {pid: threshold for pid in product_ids},
+                             on_success=lambda _: self.poll_stock_alerts_now() if self.alert_tree.winfo_exists() else None,
+                             on_error=self.show_db_error)
 
-    def load_statistics(self):
-        # Clear existing data
-        for row in self.stats_tree.get_children():
-            self.stats_tree.delete(row)
-        self.plot.clear()
+    def poll_stock_alerts_now(self):
+        if self.stock_alert_id is not None:
+            self.root.after_cancel(self.stock_alert_id)
+        self.poll_stock_alerts()
 
+    def load_statistics(self):
         # Get sales statistics: total quantity sold and total sales per product
-        self.cursor.execute("""
-            SELECT p.name, 
-                   IFNULL(SUM(oi.quantity), 0) AS total_quantity,
-                   IFNULL(SUM(oi.quantity * oi.price_each), 0) AS total_sales
-            FROM products p
-            LEFT JOIN order_items oi ON p.product_id = oi.product_id
-            GROUP BY p.name
-            ORDER BY total_sales DESC
-        """)
-        stats_data = self.cursor.fetchall()
-        
-        if not stats_data:
+        width = self.stats_image.winfo_width()
+        height = self.stats_image.winfo_height()
+        if width <= 1 or height <= 1:
+            # Not laid out yet
+            width, height = 800, 400
+        self.executor.submit(self.statistics_with_chart, width, height, on_success=self.show_statistics,
+                             on_error=self.show_db_error, group="screen")
+
+    def statistics_with_chart(self, width, height):
+        # Runs on the executor: query, fingerprint and chart image together
+        stats_data = self.store.orders.sales_statistics()
+        return stats_data, fingerprint(stats_data), self.chart.render(stats_data, width, height)
+
+    def show_statistics(self, result):
+        stats_data, stats_key, chart = result
+        # Unchanged sales since the last refresh: nothing to redo
+        if stats_key != self.stats_key:
+            self.stats_key = stats_key
+            for row in self.stats_tree.get_children():
+                self.stats_tree.delete(row)
+            for product_id, name, qty, sales_amount in stats_data:
+                self.stats_tree.insert("", tk.END, iid=str(product_id),
+                                       values=(qty, f"${sales_amount:.2f}"), text=name)
+        if chart.key != self.chart_key:
+            self.chart_key = chart.key
+            self.stats_photo = tk.PhotoImage(data=chart.photo_data)
+            self.stats_image.configure(image=self.stats_photo)
+
+    def load_trends(self):
+        try:
+            start = datetime.date.fromisoformat(self.trend_start.get().strip())
+            end = datetime.date.fromisoformat(self.trend_end.get().strip())
+            window = int(self.trend_window.get())
+        except ValueError:
+            messagebox.showerror("Error", "Dates must be YYYY-MM-DD and the moving average a whole number.")
             return
-
-        # Prepare data for the table and graph
-        product_names = []
-        quantities = []
-        sales = []
-        
-        for name, qty, sales_amount in stats_data:
-            self.stats_tree.insert("", tk.END, values=(qty, f"${sales_amount:.2f}"), text=name)
-            product_names.append(name)
-            quantities.append(qty)
-            sales.append(sales_amount)
-
-        # Create bar graph
-        x = range(len(product_names))
-        bars = self.plot.bar(x, sales, color='skyblue')
-        self.plot.set_title('Product Sales Performance')
-        self.plot.set_xlabel('Products')
-        self.plot.set_ylabel('Total Sales ($)')
-        self.plot.set_xticks(x)
-        self.plot.set_xticklabels(product_names, rotation=45, ha='right')
-        
-        # Add value labels on top of bars
-        for bar in bars:
-            height = bar.get_height()
-            self.plot.text(bar.get_x() + bar.get_width()/2., height,
-                         f'${height:.2f}',
-                         ha='center', va='bottom')
-
-        self.figure.tight_layout()
-        self.canvas.draw()
+        if end < start:
+            messagebox.showerror("Error", "The end date is before the start date.")
+            return
+        self.executor.submit(self.analytics.report, start, end, self.trend_granularity.get(),
+                             ma_window=window, on_success=self.show_trends,
+                             on_error=self.show_db_error, group="screen")
+
+    def show_trends(self, report):
+        for row in self.top_tree.get_children():
+            self.top_tree.delete(row)
+        for product_id, name, revenue, units in report.top:
+            self.top_tree.insert("", tk.END, iid=str(product_id), values=(name, units, f"${revenue:.2f}"))
+
+        self.trend_plot.clear()
+        periods = report.periods.astype(datetime.date)
+        self.trend_plot.plot(periods, report.revenue, color="skyblue", label="Revenue")
+        self.trend_plot.plot(periods, report.revenue_ma, color="navy", label="Moving average")
+        self.trend_plot.set_title(f"Revenue per {report.granularity}")
+        self.trend_plot.set_ylabel("Sales ($)")
+        self.trend_plot.legend(loc="upper left")
+        self.trend_figure.autofmt_xdate()
+        self.trend_figure.tight_layout()
+        self.trend_canvas.draw()
+
+    def show_diagnostics(self):
+        # Top statements by total time; reads the profiler's memory, no query
+        for row in self.diag_tree.get_children():
+            self.diag_tree.delete(row)
+        for stats in self.profiler.top(50):
+            self.diag_tree.insert("", tk.END, values=(
+                stats.calls, f"{stats.total_ms:.1f}", f"{stats.mean_ms:.2f}", f"{stats.percentile_ms(0.95):.2f}",
+                f"{stats.max_ms:.2f}", stats.rows, stats.sql))
+
+        self.slow_text.delete("1.0", tk.END)
+        slow = self.profiler.slow_queries()
+        if not slow:
+            self.slow_text.insert(tk.END, "No slow queries recorded.")
+        for query in reversed(slow):
+            when = datetime.datetime.fromtimestamp(query.when).strftime("%H:%M:%S")
+            self.slow_text.insert(tk.END, f"{when}  {query.elapsed_ms:.1f} ms, {query.rows} rows\n{query.sql}\n")
+            for step in query.plan:
+                self.slow_text.insert(tk.END, f"    {step}\n")
+            self.slow_text.insert(tk.END, "\n")
+
+    def reset_diagnostics(self):
+        self.profiler.reset()
+        self.show_diagnostics()
 
     def logout(self):
+        if self.current_user is not None:
+            if self.current_user["role"] == "customer":
+                # The cart stays on the server; write out the last edits
+                self.flush_cart()
+            if self.cart_flushing:
+                # Their session is needed until the batch has been written
+                self.logout_tokens.append(self.current_user["token"])
+            else:
+                self.executor.submit(self.store.auth.logout, self.current_user["token"])
         self.current_user = None
         self.cart = {}
         self.create_login_screen()
 
+    def on_close(self):
+        self.executor.shutdown()
+        for owner, changes in self.cart_changes.items():
+            self.store.carts.apply(owner, {pid: change["quantity"] for pid, change in changes.items()})
+        for token in self.logout_tokens:
+            self.store.auth.logout(token)
+        self.store.close()
+        self.root.destroy()
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Online retail management application")
+    parser.add_argument("--server", metavar="URL",
+                        help="run as a client of server.py, e.g. http://127.0.0.1:8080")
+    args = parser.parse_args()
     root = tk.Tk()
-    app = OnlineRetailApp(root)
+    app = OnlineRetailApp(root, server_url=args.server)
     root.mainloop()
\ No newline at end of file
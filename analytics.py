@@ -0,0 +1,150 @@
+import datetime
+
+import numpy as np
+
+GRANULARITIES = ("day", "week", "month")
+
+# Unix epoch day of an order: the day part of the stored order_date text,
+# computed in SQL so no date strings are parsed in Python
+ORDER_LINES_SQL = """
+    SELECT CAST(julianday(substr(o.order_date, 1, 10)) - 2440587.5 AS INTEGER),
+           oi.product_id, oi.quantity, oi.quantity * oi.price_each
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.order_id
+    WHERE o.order_date >= ? AND o.order_date < ?
+"""
+
+
+def epoch_day(date):
+    return (date - datetime.date(1970, 1, 1)).days
+
+
+class OrderLines:
+    # Columnar order lines: one NumPy array per column, same length
+    def __init__(self, day, product_id, quantity, revenue):
+        self.day = day
+        self.product_id = product_id
+        self.quantity = quantity
+        self.revenue = revenue
+
+    def __len__(self):
+        return len(self.day)
+
+
+def load_order_lines(pool, start, end, chunk_size=500000):
+    # Order lines dated start <= day < end (datetime.date), fetched with
+    # fetchmany and converted chunk by chunk into compact arrays
+    cursor = pool.connection().execute(
+        ORDER_LINES_SQL, (start.isoformat(), end.isoformat()))
+    chunks = []
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        chunk = np.array(rows, dtype=np.float64)
+        chunks.append((chunk[:, 0].astype(np.int32), chunk[:, 1].astype(np.int32),
+                       chunk[:, 2].astype(np.int32), chunk[:, 3]))
+    if not chunks:
+        empty = np.empty(0, dtype=np.int32)
+        return OrderLines(empty, empty, empty, np.empty(0, dtype=np.float64))
+    return OrderLines(*(np.concatenate(column) for column in zip(*chunks)))
+
+
+def bucket_index(days, granularity, origin):
+    # Buckets numbered from the one containing `origin` (an epoch day)
+    if granularity == "day":
+        return days - origin
+    if granularity == "week":
+        # Weeks start on Monday; epoch day 0 was a Thursday
+        return (days + 3) // 7 - (origin + 3) // 7
+    if granularity == "month":
+        months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        return months - np.datetime64(origin, "D").astype("datetime64[M]").astype(np.int64)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def bucket_starts(granularity, origin, count):
+    first = np.datetime64(origin, "D")
+    if granularity == "day":
+        return first + np.arange(count)
+    if granularity == "week":
+        monday = first - (origin + 3) % 7
+        return monday + 7 * np.arange(count)
+    month = first.astype("datetime64[M]")
+    return (month + np.arange(count)).astype("datetime64[D]")
+
+
+def rollup(lines, granularity, start, end):
+    # Revenue and units per bucket over [start, end), with empty buckets
+    # filled in as zeros so the series is contiguous
+    origin = epoch_day(start)
+    last = epoch_day(end) - 1
+    count = int(bucket_index(np.array([last]), granularity, origin)[0]) + 1
+    index = bucket_index(lines.day.astype(np.int64), granularity, origin)
+    revenue = np.bincount(index, weights=lines.revenue, minlength=count)[:count].astype(np.float64)
+    units = np.bincount(index, weights=lines.quantity, minlength=count)[:count].astype(np.int64)
+    return bucket_starts(granularity, origin, count), revenue, units
+
+
+def top_products(lines, n=10):
+    # (product_ids, revenue, units) of the n best sellers by revenue
+    if not len(lines):
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=np.int64)
+    revenue = np.bincount(lines.product_id, weights=lines.revenue)
+    units = np.bincount(lines.product_id, weights=lines.quantity)
+    n = min(n, len(revenue))
+    best = np.argpartition(revenue, -n)[-n:]
+    best = best[np.argsort(revenue[best])[::-1]]
+    best = best[revenue[best] > 0]
+    return best, revenue[best], units[best].astype(np.int64)
+
+
+def moving_average(values, window):
+    # Trailing mean over `window` buckets; the first window-1 points average
+    # what is available so far
+    if window <= 1 or not len(values):
+        return np.asarray(values, dtype=np.float64)
+    sums = np.cumsum(np.asarray(values, dtype=np.float64))
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts
+
+
+class SalesReport:
+    def __init__(self, granularity, periods, revenue, units, revenue_ma, top):
+        self.granularity = granularity
+        self.periods = periods
+        self.revenue = revenue
+        self.units = units
+        self.revenue_ma = revenue_ma
+        # [(product_id, name, revenue, units)], best first
+        self.top = top
+
+
+class AnalyticsEngine:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def report(self, start, end, granularity="day", top_n=10, ma_window=7):
+        # start and end are datetime.date; end is inclusive for callers
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        if end < start:
+            raise ValueError("End date is before start date.")
+        end = end + datetime.timedelta(days=1)
+        lines = load_order_lines(self.pool, start, end)
+        periods, revenue, units = rollup(lines, granularity, start, end)
+        ids, top_revenue, top_units = top_products(lines, top_n)
+        names = self._product_names(ids)
+        top = [(int(pid), names.get(int(pid), f"#{pid}"), float(rev), int(qty))
+               for pid, rev, qty in zip(ids, top_revenue, top_units)]
+        return SalesReport(granularity, periods, revenue, units, moving_average(revenue, ma_window), top)
+
+    def _product_names(self, product_ids):
+        product_ids = [int(pid) for pid in product_ids]
+        if not product_ids:
+            return {}
+        placeholders = ",".join("?" * len(product_ids))
+        return dict(self.pool.connection().execute(
+            f"SELECT product_id, name FROM products WHERE product_id IN ({placeholders})", product_ids
+        ).fetchall())
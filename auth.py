@@ -0,0 +1,201 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _unb64(text):
+    return base64.b64decode(text.encode("ascii"))
+
+
+class PasswordHasher:
+    # Salted, memory-hard password hashes from the standard library.
+    #
+    # Stored formats:
+    #   scrypt$<n>$<r>$<p>$<salt>$<hash>
+    #   pbkdf2_sha256$<iterations>$<salt>$<hash>
+    # Anything else is a legacy plaintext password; it still verifies, and is
+    # reported as needing a rehash so it gets upgraded on the next login.
+    #
+    # The defaults (scrypt n=2**14, r=8) cost about 16 MB and a few tens of
+    # milliseconds per hash; raise n to make offline attacks more expensive.
+    def __init__(self, algorithm="scrypt", n=2 ** 14, r=8, p=1, iterations=600000, salt_bytes=16):
+        if algorithm not in ("scrypt", "pbkdf2_sha256"):
+            raise ValueError(f"Unknown password hash algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self.n = n
+        self.r = r
+        self.p = p
+        self.iterations = iterations
+        self.salt_bytes = salt_bytes
+
+    def hash(self, password):
+        salt = os.urandom(self.salt_bytes)
+        if self.algorithm == "scrypt":
+            digest = self._scrypt(password, salt, self.n, self.r, self.p)
+            return f"scrypt${self.n}${self.r}${self.p}${_b64(salt)}${_b64(digest)}"
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, self.iterations)
+        return f"pbkdf2_sha256${self.iterations}${_b64(salt)}${_b64(digest)}"
+
+    def verify(self, password, stored):
+        # Returns (matches, needs_rehash)
+        parts = stored.split("$")
+        if parts[0] == "scrypt" and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            salt, expected = _unb64(parts[4]), _unb64(parts[5])
+            digest = self._scrypt(password, salt, n, r, p, len(expected))
+            current = self.algorithm == "scrypt" and (n, r, p) == (self.n, self.r, self.p)
+        elif parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            iterations = int(parts[1])
+            salt, expected = _unb64(parts[2]), _unb64(parts[3])
+            digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations, len(expected))
+            current = self.algorithm == "pbkdf2_sha256" and iterations == self.iterations
+        else:
+            # Legacy plaintext row
+            return hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8")), True
+        matches = hmac.compare_digest(digest, expected)
+        return matches, matches and not current
+
+    def _scrypt(self, password, salt, n, r, p, dklen=32):
+        # maxmem must cover 128 * n * r bytes plus some headroom
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r + 1024 * 1024, dklen=dklen)
+
+
+class SessionCache:
+    # Short-lived, in-memory login state so re-authenticating within a
+    # session costs a dictionary lookup instead of a password hash.
+    #
+    # tokens:      session token -> user, for callers that hold a token
+    # credentials: username -> keyed HMAC of the password that last logged
+    #              in, so logging in again with the same password skips the
+    #              hash. The HMAC key lives only in this process.
+    def __init__(self, ttl=900, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.tokens = OrderedDict()
+        self.credentials = OrderedDict()
+        self._key = os.urandom(32)
+        self._lock = threading.Lock()
+
+    def issue(self, user):
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._put(self.tokens, token, user)
+        return token
+
+    def user_for_token(self, token):
+        with self._lock:
+            return self._get(self.tokens, token)
+
+    def revoke(self, token):
+        with self._lock:
+            self.tokens.pop(token, None)
+
+    def remember_credentials(self, username, password, user):
+        with self._lock:
+            self._put(self.credentials, username, (self._mac(password), user))
+
+    def check_credentials(self, username, password):
+        with self._lock:
+            entry = self._get(self.credentials, username)
+        if entry is not None and hmac.compare_digest(entry[0], self._mac(password)):
+            return entry[1]
+        return None
+
+    def forget_credentials(self, username):
+        with self._lock:
+            self.credentials.pop(username, None)
+
+    def _mac(self, password):
+        return hmac.new(self._key, password.encode("utf-8"), hashlib.sha256).digest()
+
+    def _put(self, table, key, value):
+        table[key] = (value, time.monotonic() + self.ttl)
+        table.move_to_end(key)
+        while len(table) > self.max_entries:
+            table.popitem(last=False)
+
+    def _get(self, table, key):
+        entry = table.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires < time.monotonic():
+            del table[key]
+            return None
+        return value
+
+
+class DatabaseSessions(SessionCache):
+    # Session tokens kept in the sessions table instead of process memory, so
+    # a token issued by one server process is accepted by all of them.
+    # Credential caching stays per process.
+    def __init__(self, repository, ttl=900, max_entries=10000):
+        super().__init__(ttl, max_entries)
+        self.repository = repository
+
+    def issue(self, user):
+        token = secrets.token_urlsafe(32)
+        self.repository.create(self._token_hash(token), user, time.time() + self.ttl)
+        return token
+
+    def user_for_token(self, token):
+        return self.repository.find(self._token_hash(token), time.time())
+
+    def revoke(self, token):
+        self.repository.delete(self._token_hash(token))
+
+    def purge_expired(self):
+        return self.repository.delete_expired(time.time())
+
+    def _token_hash(self, token):
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class AuthService:
+    # Password checks for login and registration. Everything here may take
+    # tens of milliseconds (that is the point of the hash), so the GUI runs it
+    # on the UI executor rather than on the Tk thread.
+    def __init__(self, users, hasher=None, sessions=None):
+        self.users = users
+        self.hasher = hasher or PasswordHasher()
+        self.sessions = sessions or SessionCache()
+
+    def login(self, username, password):
+        # Returns the user dict (with a session "token") or None
+        user = self.sessions.check_credentials(username, password)
+        if user is None:
+            row = self.users.find_by_username(username)
+            if row is None:
+                return None
+            user_id, role, stored = row
+            matches, needs_rehash = self.hasher.verify(password, stored)
+            if not matches:
+                return None
+            if needs_rehash:
+                # Upgrades plaintext rows and hashes made with older parameters.
+                # Conditional on the stored value so a concurrent password
+                # change wins.
+                self.users.update_password(user_id, self.hasher.hash(password), stored)
+            user = {"user_id": user_id, "username": username, "role": role}
+            self.sessions.remember_credentials(username, password, user)
+        return dict(user, token=self.sessions.issue(user))
+
+    def authenticate(self, token):
+        return self.sessions.user_for_token(token)
+
+    def logout(self, token):
+        self.sessions.revoke(token)
+
+    def register(self, username, password, role="customer"):
+        # Raises sqlite3.IntegrityError when the username is taken
+        return self.users.create(username, self.hasher.hash(password), role)
@@ -0,0 +1,117 @@
+# Vectorized sales rollups against the equivalent SQL GROUP BY queries.
+#
+#   python benchmarks/bench_analytics.py --lines 10000000
+#
+# Generates synthetic orders over a year, then answers the same questions
+# (revenue and units per day, week and month, plus top 10 products) two ways:
+#   sql    - one GROUP BY query per question, the way load_statistics works
+#   numpy  - load the order lines once as columnar arrays (AnalyticsEngine)
+#            and compute every rollup from memory; further rollups over the
+#            same range cost only the compute part
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from analytics import load_order_lines, rollup, top_products  # noqa: E402
+from retail_db import RetailStore  # noqa: E402
+
+SQL_QUERIES = {
+    "day": "substr(o.order_date, 1, 10)",
+    "week": "strftime('%Y-%W', o.order_date)",
+    "month": "substr(o.order_date, 1, 7)",
+}
+
+
+def populate(store, lines, products, days, seed):
+    rng = random.Random(seed)
+    start = datetime.datetime(2024, 1, 1)
+    conn = store.pool.connection()
+    with store.pool.transaction(immediate=True):
+        conn.executemany(
+            "INSERT INTO products (name, price, stock_quantity) VALUES (?, ?, ?)",
+            [(f"Product {i}", round(rng.uniform(5, 500), 2), 1000) for i in range(products)],
+        )
+        order_id = 0
+        written = 0
+        while written < lines:
+            orders = []
+            items = []
+            for _ in range(10000):
+                order_id += 1
+                date = start + datetime.timedelta(seconds=rng.randrange(days * 86400))
+                n = rng.randint(1, 5)
+                orders.append((order_id, 1, date.strftime("%Y-%m-%d %H:%M:%S"), 0.0, "paid"))
+                for _ in range(n):
+                    items.append((order_id, rng.randint(1, products), rng.randint(1, 4), 9.99))
+                written += n
+                if written >= lines:
+                    break
+            conn.executemany(
+                "INSERT INTO orders (order_id, user_id, order_date, total_amount, payment_status) "
+                "VALUES (?, ?, ?, ?, ?)", orders)
+            conn.executemany(
+                "INSERT INTO order_items (order_id, product_id, quantity, price_each) VALUES (?, ?, ?, ?)",
+                items)
+    return written
+
+
+def run_sql(conn, start, end):
+    for expr in SQL_QUERIES.values():
+        conn.execute(f"""
+            SELECT {expr}, SUM(oi.quantity), SUM(oi.quantity * oi.price_each)
+            FROM orders o JOIN order_items oi ON oi.order_id = o.order_id
+            WHERE o.order_date >= ? AND o.order_date < ?
+            GROUP BY 1
+        """, (start.isoformat(), end.isoformat())).fetchall()
+    conn.execute("""
+        SELECT oi.product_id, SUM(oi.quantity * oi.price_each) AS revenue
+        FROM orders o JOIN order_items oi ON oi.order_id = o.order_id
+        WHERE o.order_date >= ? AND o.order_date < ?
+        GROUP BY oi.product_id ORDER BY revenue DESC LIMIT 10
+    """, (start.isoformat(), end.isoformat())).fetchall()
+
+
+def run_numpy(pool, start, end):
+    started = time.perf_counter()
+    lines = load_order_lines(pool, start, end)
+    loaded = time.perf_counter()
+    for granularity in ("day", "week", "month"):
+        rollup(lines, granularity, start, end)
+    top_products(lines, 10)
+    return loaded - started, time.perf_counter() - loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sales analytics benchmark")
+    parser.add_argument("--lines", type=int, default=1000000, help="order lines to generate")
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RetailStore(os.path.join(tmp, "bench.db"))
+        started = time.perf_counter()
+        written = populate(store, args.lines, args.products, args.days, args.seed)
+        print(f"generated {written} order lines in {time.perf_counter() - started:.1f}s")
+
+        start = datetime.date(2024, 1, 1)
+        end = start + datetime.timedelta(days=args.days)
+
+        started = time.perf_counter()
+        run_sql(store.pool.connection(), start, end)
+        print(f"sql    4 GROUP BY queries:            {time.perf_counter() - started:7.2f}s")
+
+        load, compute = run_numpy(store.pool, start, end)
+        print(f"numpy  load {load:6.2f}s + 4 rollups {compute:6.3f}s = {load + compute:7.2f}s")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
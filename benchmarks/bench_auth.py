@@ -0,0 +1,66 @@
+# Logins per second at a given password hash cost.
+#
+#   python benchmarks/bench_auth.py --n 16384 --threads 4 --logins 200
+#
+# cold:   every login verifies the stored scrypt hash
+# cached: repeat logins within the session cache TTL
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from auth import AuthService, PasswordHasher, SessionCache  # noqa: E402
+from retail_db import RetailStore  # noqa: E402
+
+
+def run(auth, users, logins, threads, clear_cache):
+    per_thread = logins // threads
+
+    def worker(offset):
+        for i in range(per_thread):
+            username = users[(offset + i) % len(users)]
+            if clear_cache:
+                auth.sessions.forget_credentials(username)
+            if auth.login(username, "secret-" + username) is None:
+                raise AssertionError(f"login failed for {username}")
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Password verification throughput benchmark")
+    parser.add_argument("--n", type=int, default=2 ** 14, help="scrypt cost parameter")
+    parser.add_argument("--r", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RetailStore(os.path.join(tmp, "bench.db"))
+        auth = AuthService(store.users, PasswordHasher(n=args.n, r=args.r), SessionCache())
+        users = [f"user{i}" for i in range(args.users)]
+        for username in users:
+            auth.register(username, "secret-" + username)
+
+        start = time.perf_counter()
+        auth.hasher.hash("x")
+        print(f"scrypt n={args.n} r={args.r}: {(time.perf_counter() - start) * 1000:.1f} ms per hash")
+        for threads in sorted({1, args.threads}):
+            print(f"cold   {threads} thread(s): {run(auth, users, args.logins, threads, True):8.1f} logins/s")
+        print(f"cached {args.threads} thread(s): {run(auth, users, args.logins * 50, args.threads, False):8.1f} logins/s")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
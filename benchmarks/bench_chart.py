@@ -0,0 +1,86 @@
+# Sales statistics chart: the old full redraw against SalesChartRenderer.
+#
+#   python benchmarks/bench_chart.py --products 1000
+#
+# full:      what show_statistics used to do - clear the axes, one bar and
+#            one text label per product, tight_layout(), draw everything
+# cold:      renderer, first render (full draw of top-N + "Other")
+# one order: renderer after one product's sales changed (bars updated with
+#            set_height and blitted)
+# unchanged: renderer with the same data again (image cache hit)
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+from sales_chart import SalesChartRenderer  # noqa: E402
+
+
+def full_redraw(figure, plot, canvas, stats):
+    plot.clear()
+    names = [row[1] for row in stats]
+    sales = [row[3] for row in stats]
+    x = range(len(names))
+    bars = plot.bar(x, sales, color="skyblue")
+    plot.set_xticks(x)
+    plot.set_xticklabels(names, rotation=45, ha="right")
+    for bar in bars:
+        height = bar.get_height()
+        plot.text(bar.get_x() + bar.get_width() / 2., height, f"${height:.2f}", ha="center", va="bottom")
+    figure.tight_layout()
+    canvas.draw()
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sales chart rendering benchmark")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    stats = [(i, f"Product {i}", 0, round(rng.paretovariate(1.2) * 100, 2)) for i in range(1, args.products + 1)]
+
+    figure = Figure(figsize=(8, 4), dpi=100)
+    plot = figure.add_subplot(111)
+    canvas = FigureCanvasAgg(figure)
+    print(f"full      {timed(lambda: full_redraw(figure, plot, canvas, stats), min(args.repeat, 2)):9.1f} ms"
+          f"  ({args.products} bars)")
+
+    renderer = SalesChartRenderer()
+
+    def cold():
+        renderer.cache.clear()
+        renderer._layout = None
+        renderer.render(stats)
+    print(f"cold      {timed(cold, args.repeat):9.1f} ms")
+
+    # The best seller gains a little without changing the ranking or axis
+    top = max(stats, key=lambda row: row[3])[0]
+
+    def one_order():
+        stats[top - 1] = stats[top - 1][:3] + (stats[top - 1][3] + 0.01,)
+        renderer.render(stats)
+    print(f"one order {timed(one_order, args.repeat):9.1f} ms")
+    print(f"unchanged {timed(lambda: renderer.render(stats), args.repeat):9.3f} ms")
+    print(f"full draws {renderer.full_draws}, blitted updates {renderer.blits}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Throughput of concurrent checkouts against one database file.
+#
+#   python benchmarks/bench_checkout.py --processes 4 --threads 4 --orders 200
+#
+# Every worker places orders for random products through CheckoutEngine.
+# At the end the script checks that no stock went negative and that the
+# units sold plus the remaining stock add up to the initial stock.
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from checkout import InsufficientStockError  # noqa: E402
+from retail_db import RetailStore  # noqa: E402
+
+
+def setup(db_path, products, stock):
+    store = RetailStore(db_path)
+    store.users.ensure_admin()
+    store.products.add_defaults([(f"Product {i}", 10.0 + i, stock) for i in range(products)])
+    store.close()
+
+
+def worker(db_path, threads, orders, products, max_lines, seed, results):
+    store = RetailStore(db_path)
+    counts = {"placed": 0, "rejected": 0}
+    lock = threading.Lock()
+
+    def run(thread_seed):
+        rng = random.Random(thread_seed)
+        placed = rejected = 0
+        for _ in range(orders):
+            pids = rng.sample(range(1, products + 1), rng.randint(1, max_lines))
+            items = [(pid, rng.randint(1, 3)) for pid in pids]
+            try:
+                store.checkout.place_order(1, items)
+                placed += 1
+            except InsufficientStockError:
+                rejected += 1
+        with lock:
+            counts["placed"] += placed
+            counts["rejected"] += rejected
+
+    pool = [threading.Thread(target=run, args=(seed * 1000 + i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    results.put((counts["placed"], counts["rejected"], store.checkout.retries))
+    store.close()
+
+
+def verify(db_path, products, stock):
+    store = RetailStore(db_path)
+    conn = store.pool.connection()
+    negative = conn.execute("SELECT COUNT(*) FROM products WHERE stock_quantity < 0").fetchone()[0]
+    remaining = conn.execute("SELECT SUM(stock_quantity) FROM products").fetchone()[0]
+    sold = conn.execute("SELECT IFNULL(SUM(quantity), 0) FROM order_items").fetchone()[0]
+    store.close()
+    return negative == 0 and remaining + sold == products * stock
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent checkout throughput benchmark")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--orders", type=int, default=200, help="orders per thread")
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--stock", type=int, default=500)
+    parser.add_argument("--max-lines", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        setup(db_path, args.products, args.stock)
+
+        results = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(
+                target=worker,
+                args=(db_path, args.threads, args.orders, args.products, args.max_lines, i, results),
+            )
+            for i in range(args.processes)
+        ]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        totals = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - start
+
+        placed = sum(t[0] for t in totals)
+        rejected = sum(t[1] for t in totals)
+        retries = sum(t[2] for t in totals)
+        print(f"workers:     {args.processes} processes x {args.threads} threads")
+        print(f"placed:      {placed}")
+        print(f"rejected:    {rejected} (insufficient stock)")
+        print(f"busy retries:{retries:>6}")
+        print(f"elapsed:     {elapsed:.2f}s")
+        print(f"throughput:  {(placed + rejected) / elapsed:.0f} checkouts/s")
+        print(f"consistent:  {verify(db_path, args.products, args.stock)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# Order history paging for one account with many orders.
+#
+#   python benchmarks/bench_history.py --orders 50000 --page-size 20
+#
+# keyset: OrderRepository.order_history, a seek on idx_orders_user_date plus
+#         one IN (...) query for the lines of the page
+# offset: LIMIT/OFFSET paging with one lines query per order (N+1), for
+#         comparison
+# Both walk every page of the account from newest to oldest; the offset
+# variant gets slower the deeper the page, keyset should stay flat.
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from retail_db import RetailStore  # noqa: E402
+
+
+def populate(store, orders, other_orders, products, seed):
+    rng = random.Random(seed)
+    conn = store.pool.connection()
+    with store.pool.transaction(immediate=True):
+        user_id = conn.execute(
+            "INSERT INTO users (username, password, role) VALUES ('heavy', 'x', 'customer')").lastrowid
+        other_id = conn.execute(
+            "INSERT INTO users (username, password, role) VALUES ('other', 'x', 'customer')").lastrowid
+        conn.executemany(
+            "INSERT INTO products (name, price, stock_quantity) VALUES (?, ?, ?)",
+            [(f"Product {i}", round(rng.uniform(5, 500), 2), 1000) for i in range(products)],
+        )
+        start = datetime.datetime(2020, 1, 1)
+        order_id = 0
+        for owner, count in ((user_id, orders), (other_id, other_orders)):
+            order_rows = []
+            item_rows = []
+            for _ in range(count):
+                order_id += 1
+                # Second resolution, so some orders share a timestamp and the
+                # order_id tie-break matters
+                date = start + datetime.timedelta(seconds=rng.randrange(5 * 365 * 86400))
+                order_rows.append((order_id, owner, date.strftime("%Y-%m-%d %H:%M:%S"), 0.0, "paid"))
+                for product_id in rng.sample(range(1, products + 1), rng.randint(1, 5)):
+                    item_rows.append((order_id, product_id, rng.randint(1, 3), 9.99))
+            conn.executemany(
+                "INSERT INTO orders (order_id, user_id, order_date, total_amount, payment_status) "
+                "VALUES (?, ?, ?, ?, ?)", order_rows)
+            conn.executemany(
+                "INSERT INTO order_items (order_id, product_id, quantity, price_each) VALUES (?, ?, ?, ?)",
+                item_rows)
+    conn.execute("ANALYZE")
+    return user_id
+
+
+def offset_page(conn, user_id, offset, limit):
+    orders = conn.execute(
+        "SELECT order_id, order_date, total_amount, payment_status FROM orders "
+        "WHERE user_id = ? ORDER BY order_date DESC, order_id DESC LIMIT ? OFFSET ?",
+        (user_id, limit, offset),
+    ).fetchall()
+    page = []
+    for order_id, order_date, total, status in orders:
+        lines = conn.execute(
+            "SELECT oi.product_id, p.name, oi.quantity, oi.price_each "
+            "FROM order_items oi JOIN products p ON p.product_id = oi.product_id "
+            "WHERE oi.order_id = ? ORDER BY oi.product_id",
+            (order_id,),
+        ).fetchall()
+        page.append((order_id, order_date, total, status, lines))
+    return page
+
+
+def walk_keyset(store, user_id, limit):
+    timings = []
+    seen = []
+    cursor = None
+    while True:
+        start = time.perf_counter()
+        page, cursor = store.orders.order_history(user_id, cursor, limit)
+        timings.append(time.perf_counter() - start)
+        seen.extend(order[0] for order in page)
+        if cursor is None:
+            return timings, seen
+
+
+def walk_offset(conn, user_id, limit):
+    timings = []
+    seen = []
+    offset = 0
+    while True:
+        start = time.perf_counter()
+        page = offset_page(conn, user_id, offset, limit)
+        timings.append(time.perf_counter() - start)
+        seen.extend(order[0] for order in page)
+        if len(page) < limit:
+            return timings, seen
+        offset += limit
+
+
+def report(name, timings):
+    ms = sorted(t * 1000 for t in timings)
+    tenth = max(1, len(ms) // 10)
+    print(f"{name:7s} {len(ms):6d} pages  first {timings[0] * 1000:7.3f} ms  "
+          f"p50 {statistics.median(ms):7.3f} ms  p95 {ms[int(0.95 * (len(ms) - 1))]:7.3f} ms  "
+          f"last 10% mean {statistics.fmean(t * 1000 for t in timings[-tenth:]):7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Order history pagination benchmark")
+    parser.add_argument("--orders", type=int, default=50000, help="orders of the measured account")
+    parser.add_argument("--other-orders", type=int, default=50000, help="orders of another account")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RetailStore(os.path.join(tmp, "bench.db"))
+        started = time.perf_counter()
+        user_id = populate(store, args.orders, args.other_orders, args.products, args.seed)
+        print(f"generated {args.orders} + {args.other_orders} orders in {time.perf_counter() - started:.1f}s")
+
+        keyset, keyset_ids = walk_keyset(store, user_id, args.page_size)
+        offset, offset_ids = walk_offset(store.pool.connection(), user_id, args.page_size)
+        if keyset_ids != offset_ids or len(keyset_ids) != args.orders:
+            raise SystemExit("keyset and offset paging returned different orders")
+        report("keyset", keyset)
+        report("offset", offset)
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
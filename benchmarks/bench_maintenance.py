@@ -0,0 +1,144 @@
+# Checkout latency while maintenance runs.
+#
+#   python benchmarks/bench_maintenance.py --orders 200000 --threads 4
+#   python benchmarks/bench_maintenance.py --naive
+#
+# A database with --orders orders spread over two years is generated, then
+# --threads threads place orders back to back through CheckoutEngine. After
+# --duration seconds of plain checkouts (the baseline), a separate process
+# runs the maintenance jobs one after the other:
+#   backup   maintenance.backup, 256 pages per step
+#   archive  maintenance.archive_orders, orders older than --archive-days
+#   vacuum   maintenance.incremental_vacuum
+# Checkout latencies are reported per phase. --naive runs the same jobs the
+# one-shot way for comparison: the backup in a single step, every old order
+# archived in one batch and a full VACUUM.
+import argparse
+import datetime
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from datagen import generate  # noqa: E402
+from maintenance import archive_orders, backup, incremental_vacuum  # noqa: E402
+from retail_db import RetailStore  # noqa: E402
+
+
+def maintain(db, tmp, archive_days, naive, results):
+    phases = []
+    cutoff = datetime.date.today() - datetime.timedelta(days=archive_days)
+
+    started = time.time()
+    backup(db, os.path.join(tmp, "backup.db"), pages=-1 if naive else 256)
+    phases.append(("backup", started, time.time()))
+
+    started = time.time()
+    archive_orders(db, os.path.join(tmp, "archive.db"), cutoff, batch_size=10 ** 9 if naive else 200)
+    phases.append(("archive", started, time.time()))
+
+    started = time.time()
+    if naive:
+        conn = sqlite3.connect(db, timeout=30, isolation_level=None)
+        conn.execute("VACUUM")
+        conn.close()
+    else:
+        incremental_vacuum(db)
+    phases.append(("vacuum", started, time.time()))
+    results.put(phases)
+
+
+def shopper(store, products, users, stop, seed, samples, errors):
+    rng = random.Random(seed)
+    while not stop.is_set():
+        items = [(pid, rng.randint(1, 3)) for pid in rng.sample(products, rng.randint(1, 4))]
+        started = time.perf_counter()
+        try:
+            store.checkout.place_order(rng.choice(users), items)
+        except Exception:
+            errors.append(1)
+            continue
+        samples.append((time.time(), time.perf_counter() - started))
+
+
+def summarize(name, latencies, seconds):
+    if not latencies:
+        print(f"{name:10s} no checkouts")
+        return
+    latencies = sorted(latencies)
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+    print(f"{name:10s} {len(latencies) / seconds:8.0f}/s  p50 {statistics.median(latencies) * 1000:7.2f} ms  "
+          f"p95 {pct(0.95):7.2f} ms  p99 {pct(0.99):7.2f} ms  max {latencies[-1] * 1000:8.2f} ms  "
+          f"({seconds:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkout latency during online maintenance")
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of baseline checkouts")
+    parser.add_argument("--archive-days", type=int, default=365)
+    parser.add_argument("--naive", action="store_true", help="one-shot backup, archive and full VACUUM")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "retail.db")
+        store = RetailStore(db)
+        start = time.perf_counter()
+        generate(store, users=args.users, products=args.products, orders=args.orders, days=730, seed=args.seed)
+        print(f"generated {args.orders} orders in {time.perf_counter() - start:.1f}s")
+        conn = store.pool.connection()
+        products = [row[0] for row in conn.execute("SELECT product_id FROM products")]
+        users = [row[0] for row in conn.execute("SELECT user_id FROM users WHERE role = 'customer'")]
+
+        stop = threading.Event()
+        samples = []
+        errors = []
+        threads = [threading.Thread(target=shopper, args=(store, products, users, stop, args.seed + i,
+                                                          samples, errors))
+                   for i in range(args.threads)]
+        baseline_start = time.time()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+
+        # Spawned, not forked: a child forked while this process has the
+        # database open would inherit SQLite's lock bookkeeping without the
+        # locks themselves
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        process = context.Process(target=maintain, args=(db, tmp, args.archive_days, args.naive, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            stop.set()
+            raise SystemExit("maintenance process failed")
+        phases = results.get()
+        stop.set()
+        for thread in threads:
+            thread.join()
+        store.close()
+
+    print(f"{args.threads} checkout threads, {'naive' if args.naive else 'stepped'} maintenance, "
+          f"{len(errors)} failed checkouts")
+    first = phases[0][1]
+    summarize("baseline", [t for when, t in samples if baseline_start + 1 <= when < first], first - baseline_start - 1)
+    for name, started, finished in phases:
+        summarize(name, [t for when, t in samples if started <= when < finished], finished - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# FTS5 prefix search against a LIKE '%term%' scan.
+#
+#   python benchmarks/bench_search.py --products 300000 --queries 200
+#
+# Builds a catalog of generated product names ("Wireless Speaker QX4TB"),
+# then times as-you-type prefixes through ProductSearch.search (FTS5) and
+# ProductSearch.search_like (full scan). Broad terms match a large share of
+# the catalog; selective terms (model code prefixes) match a handful of rows,
+# which is where a LIKE scan has to read the whole table.
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from retail_db import RetailStore  # noqa: E402
+
+ADJECTIVES = ["Smart", "Wireless", "Portable", "Gaming", "Compact", "Ultra", "Classic",
+              "Premium", "Digital", "Foldable", "Rugged", "Silent", "Rapid", "Solar"]
+NOUNS = ["Laptop", "Smartphone", "Headphones", "Tablet", "Smartwatch", "Speaker", "Camera",
+         "Keyboard", "Mouse", "Monitor", "Charger", "Router", "Drone", "Projector", "Lamp"]
+CODE_CHARS = string.ascii_uppercase + string.digits
+
+
+def populate(store, count, seed):
+    rng = random.Random(seed)
+    batch = []
+    with store.pool.transaction(immediate=True) as conn:
+        for i in range(count):
+            code = "".join(rng.choice(CODE_CHARS) for _ in range(5))
+            name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {code}"
+            batch.append((name, round(rng.uniform(5, 2000), 2), rng.randint(0, 500)))
+            if len(batch) == 10000:
+                conn.executemany("INSERT INTO products (name, price, stock_quantity) VALUES (?, ?, ?)", batch)
+                batch = []
+        if batch:
+            conn.executemany("INSERT INTO products (name, price, stock_quantity) VALUES (?, ?, ?)", batch)
+
+
+def time_queries(fn, terms, limit):
+    timings = []
+    for term in terms:
+        start = time.perf_counter()
+        fn(term, limit)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings
+
+
+def report(label, timings):
+    def pct(p):
+        return timings[min(len(timings) - 1, int(len(timings) * p))] * 1000
+    print(f"{label:<15} p50 {pct(0.50):8.2f} ms   p95 {pct(0.95):8.2f} ms   max {timings[-1] * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FTS5 vs LIKE product search benchmark")
+    parser.add_argument("--products", type=int, default=300000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed + 1)
+    words = [w.lower() for w in ADJECTIVES + NOUNS]
+    # As-you-type prefixes: broad ones like "sma" or "wirel", and
+    # selective model-code prefixes like "qx4"
+    broad = [rng.choice(words)[:rng.randint(2, 6)] for _ in range(args.queries)]
+    selective = ["".join(rng.choice(CODE_CHARS) for _ in range(rng.randint(3, 4))).lower()
+                 for _ in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RetailStore(os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        populate(store, args.products, args.seed)
+        print(f"populated {args.products} products in {time.perf_counter() - start:.1f}s")
+
+        for label, terms in (("broad", broad), ("selective", selective)):
+            report(f"FTS5 {label}", time_queries(store.search.search, terms, args.limit))
+            report(f"LIKE {label}", time_queries(store.search.search_like, terms, args.limit))
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# Requests/second of server.py as the number of worker processes grows.
+#
+#   python benchmarks/datagen.py /tmp/retail-bench.db --scale small
+#   python benchmarks/bench_server.py /tmp/retail-bench.db --workers 1,2,4 --clients 16 --duration 10
+#
+# For each worker count a server is started on the database, then --clients
+# load-generating processes (so the client side is not held back by one
+# GIL) each log in as a different customer and send requests back to back
+# over one keep-alive connection:
+#   browse    GET  /api/products?after=&limit=100
+#   order     POST /api/orders (1-4 Zipf-popular products)
+#   history   GET  /api/orders
+# Orders change the database, so repeated runs see less stock; regenerate it
+# for comparable numbers.
+import argparse
+import multiprocessing
+import os
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from checkout import InsufficientStockError  # noqa: E402
+from client import RemoteStore  # noqa: E402
+from datagen import PASSWORD, ZipfSampler, parse_mix  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+OPERATIONS = ("browse", "order", "history")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=30):
+    store = RemoteStore(url)
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                store.request("GET", "/api/health")
+                return
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+    finally:
+        store.close()
+
+
+def client(url, username, products, mix, start_at, duration, seed, results):
+    rng = random.Random(seed)
+    zipf = ZipfSampler(len(products), 1.1, rng)
+    store = RemoteStore(url)
+    user = store.auth.login(username, PASSWORD)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    max_product_id = max(products)
+    latencies = []
+    errors = 0
+    time.sleep(max(0.0, start_at - time.time()))
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            if name == "browse":
+                store.catalog.page(100 * rng.randint(0, max_product_id // 100), 100)
+            elif name == "order":
+                items = [(products[zipf.sample() - 1], rng.randint(1, 3)) for _ in range(rng.randint(1, 4))]
+                try:
+                    store.request("POST", "/api/orders", {"items": items})
+                except InsufficientStockError:
+                    pass
+            else:
+                store.orders.order_history(user["user_id"])
+        except Exception:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    store.close()
+    results.put((latencies, errors))
+
+
+def run(db, workers, threads, clients, duration, mix, usernames, products, seed):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "server.py"), "--db", db, "--port", str(port),
+         "--workers", str(workers), "--threads", str(threads)],
+        stdout=subprocess.DEVNULL)
+    try:
+        wait_for(url)
+        results = multiprocessing.Queue()
+        # Logins (password hashing) happen before the measured window
+        start_at = time.time() + 1.0 + 0.1 * clients
+        processes = [multiprocessing.Process(target=client, args=(
+            url, usernames[i % len(usernames)], products, mix, start_at, duration, seed * 7919 + i, results))
+            for i in range(clients)]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait()
+    latencies = sorted(t for values, _ in collected for t in values)
+    errors = sum(e for _, e in collected)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "per_s": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000 if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP service throughput by worker count")
+    parser.add_argument("db", help="database prepared with benchmarks/datagen.py")
+    parser.add_argument("--workers", default="1,2,4", help="worker process counts to try (default: 1,2,4)")
+    parser.add_argument("--threads", type=int, help="threads per worker (default: --clients)")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent client processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per worker count")
+    parser.add_argument("--mix", default="browse=70,order=20,history=10")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix, OPERATIONS)
+    conn = sqlite3.connect(args.db)
+    products = [row[0] for row in conn.execute("SELECT product_id FROM products ORDER BY product_id")]
+    usernames = [row[0] for row in conn.execute(
+        "SELECT username FROM users WHERE role = 'customer' AND username LIKE 'user%' ORDER BY user_id LIMIT ?",
+        (args.clients,))]
+    conn.close()
+    if not products or not usernames:
+        raise SystemExit("Database has no products or customers; run benchmarks/datagen.py first.")
+    # Hot products first, as datagen ranks them
+    random.Random(args.seed).shuffle(products)
+
+    print(f"{args.clients} clients, {args.duration:.0f}s each, mix {args.mix}, {os.cpu_count()} CPUs")
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(",")]:
+        result = run(args.db, workers, args.threads or args.clients, args.clients, args.duration, mix,
+                     usernames, products, args.seed)
+        baseline = baseline or result["per_s"]
+        print(f"workers {workers:2d}  {result['per_s']:8.1f} req/s  x{result['per_s'] / baseline:4.2f}  "
+              f"p50 {result['p50_ms']:6.2f} ms  p95 {result['p95_ms']:6.2f} ms  "
+              f"({result['requests']} requests, {result['errors']} errors)")
+
+
+if __name__ == "__main__":
+    main()
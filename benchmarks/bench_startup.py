@@ -0,0 +1,123 @@
+# Cold-start cost of the application, broken down by import.
+#
+#   python benchmarks/bench_startup.py --runs 5
+#
+# import:  `python -X importtime -c "import OnlineRetailApp"` in a fresh
+#          interpreter per run; prints the median total and the direct
+#          imports of the module by cumulative time (what -X importtime
+#          reports, medians over the runs)
+# store:   opening and closing RetailStore on a new database file (every
+#          migration runs) and then on the same file again (schema version
+#          already current, so nothing but a PRAGMA read)
+# window:  from interpreter start to the first drawn login screen of
+#          OnlineRetailApp; needs a display and is skipped without one
+#
+# --module times another entry point's imports instead (e.g. server).
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+STORE_SCRIPT = """
+import json, sys, time
+from retail_db import RetailStore
+timings = []
+for _ in range(2):
+    started = time.perf_counter()
+    RetailStore(sys.argv[1]).close()
+    timings.append(time.perf_counter() - started)
+print(json.dumps(timings))
+"""
+
+WINDOW_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import tkinter as tk
+from OnlineRetailApp import OnlineRetailApp
+root = tk.Tk()
+app = OnlineRetailApp(root)
+root.update()
+elapsed = time.perf_counter() - started
+app.on_close()
+print(json.dumps(elapsed))
+"""
+
+
+def python(args, cwd=None):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable] + args, cwd=cwd or ROOT, env=env, capture_output=True,
+                          text=True, check=True)
+
+
+def import_times(module):
+    # {module name: (depth, cumulative us)} from one fresh interpreter
+    stderr = python(["-X", "importtime", "-c", f"import {module}"]).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        times[name.strip()] = (depth, int(cumulative_us))
+    return times
+
+
+def bench_imports(module, runs, top):
+    samples = [import_times(module) for _ in range(runs)]
+    total = statistics.median(sample[module][1] for sample in samples) / 1000
+    print(f"import {module}: {total:8.1f} ms (median of {runs})")
+    # Direct imports are one level below the module itself
+    depth = samples[0][module][0] + 1
+    names = [name for name, (level, _) in samples[0].items() if level == depth]
+    rows = []
+    for name in names:
+        values = [sample[name][1] for sample in samples if name in sample]
+        rows.append((statistics.median(values) / 1000, name))
+    for ms, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+
+def bench_store(runs):
+    first, again = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(runs):
+            db = os.path.join(tmp, f"startup-{run}.db")
+            timings = json.loads(python(["-c", STORE_SCRIPT, db]).stdout)
+            first.append(timings[0])
+            again.append(timings[1])
+    print(f"open store, new file:      {statistics.median(first) * 1000:8.1f} ms")
+    print(f"open store, current file:  {statistics.median(again) * 1000:8.1f} ms")
+
+
+def bench_window(runs):
+    if sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+        print("login window: skipped (no display)")
+        return
+    timings = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # The first run creates retail.db in tmp; the rest reopen it
+        for _ in range(runs + 1):
+            timings.append(json.loads(python(["-c", WINDOW_SCRIPT], cwd=tmp).stdout))
+    print(f"login window, new db:      {timings[0] * 1000:8.1f} ms")
+    print(f"login window:              {statistics.median(timings[1:]) * 1000:8.1f} ms (median of {runs})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import and startup time of the application")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--module", default="OnlineRetailApp", help="module whose imports are timed")
+    parser.add_argument("--top", type=int, default=15, help="direct imports to list")
+    args = parser.parse_args()
+
+    bench_imports(args.module, args.runs, args.top)
+    bench_store(args.runs)
+    bench_window(args.runs)
+
+
+if __name__ == "__main__":
+    main()
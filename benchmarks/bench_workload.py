@@ -0,0 +1,222 @@
+# Mixed retail workload replayed headlessly against a database.
+#
+#   python benchmarks/datagen.py /tmp/retail-bench.db --scale medium
+#   python benchmarks/bench_workload.py /tmp/retail-bench.db --threads 8 --duration 30 \
+#       --output results.json [--compare baseline.json --tolerance 0.2]
+#
+# Operations go through the same store methods (and so the same SQL) as the
+# GUI:
+#   browse    CatalogCache.page             (load_products)
+#   checkout  CheckoutEngine.place_order    (direct order, no cart)
+#   cart      CartService.apply + checkout  (cart edits, then place_order)
+#   register  AuthService.register          (register_customer)
+#   stats     OrderRepository.sales_statistics (load_statistics)
+# Results are JSON: per operation count, errors, throughput and p50/p95/p99
+# latency in milliseconds. With --compare, operations whose p95 grew by more
+# than --tolerance against the baseline are listed and the exit status is 1.
+# --profile adds the top statements by total time (profiling.QueryProfiler).
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from checkout import InsufficientStockError  # noqa: E402
+from datagen import ZipfSampler, parse_mix  # noqa: E402
+from profiling import QueryProfiler  # noqa: E402
+from retail_db import RetailStore  # noqa: E402
+
+OPERATIONS = ("browse", "checkout", "cart", "register", "stats")
+DEFAULT_MIX = "browse=70,checkout=20,stats=8,register=2"
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(p * (len(sorted_values) - 1))))]
+
+
+class Workload:
+    def __init__(self, store, seed):
+        conn = store.pool.connection()
+        self.store = store
+        self.products = [row[0] for row in conn.execute("SELECT product_id FROM products ORDER BY product_id")]
+        self.user_ids = [row[0] for row in conn.execute("SELECT user_id FROM users WHERE role='customer'")]
+        if not self.products or not self.user_ids:
+            raise SystemExit("Database has no products or customers; run benchmarks/datagen.py first.")
+        self.max_product_id = self.products[-1]
+        self.ranking = list(range(len(self.products)))
+        random.Random(seed).shuffle(self.ranking)
+        self.seed = seed
+
+    def runner(self, thread_index):
+        rng = random.Random(self.seed * 7919 + thread_index)
+        zipf = ZipfSampler(len(self.products), 1.1, rng)
+
+        def browse():
+            # Page boundaries a user would hit scrolling from the top, so
+            # repeated pages are served by the catalog cache as in the GUI
+            self.store.catalog.page(100 * rng.randint(0, self.max_product_id // 100), 100)
+
+        def checkout():
+            lines = []
+            for _ in range(rng.randint(1, 4)):
+                product_id = self.products[self.ranking[zipf.sample() - 1]]
+                lines.append((product_id, rng.randint(1, 3)))
+            try:
+                self.store.checkout.place_order(rng.choice(self.user_ids), lines)
+            except InsufficientStockError:
+                pass
+
+        def cart():
+            # Each edit is its own batch, as when clicks are more than
+            # CART_FLUSH_MS apart; the last one rides along with checkout
+            user_id = rng.choice(self.user_ids)
+            edits = []
+            for _ in range(rng.randint(1, 4)):
+                product_id = self.products[self.ranking[zipf.sample() - 1]]
+                edits.append({product_id: rng.randint(1, 3)})
+            try:
+                for changes in edits[:-1]:
+                    self.store.carts.apply(user_id, changes)
+                self.store.carts.checkout(user_id, edits[-1])
+            except InsufficientStockError:
+                pass
+
+        def register():
+            self.store.auth.register(f"bench-{uuid.uuid4().hex}", "bench-password")
+
+        def stats():
+            self.store.orders.sales_statistics()
+
+        return rng, {"browse": browse, "checkout": checkout, "cart": cart, "register": register, "stats": stats}
+
+
+def run(store, mix, threads, duration, seed):
+    workload = Workload(store, seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng, ops = workload.runner(index)
+        local = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                ops[name]()
+            except sqlite3.Error:
+                local_errors[name] += 1
+                continue
+            local[name].append(time.perf_counter() - start)
+        with lock:
+            for name in names:
+                latencies[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    operations = {}
+    for name in names:
+        values = sorted(latencies[name])
+        operations[name] = {
+            "count": len(values),
+            "errors": errors[name],
+            "throughput_per_s": round(len(values) / elapsed, 2),
+            "p50_ms": _ms(percentile(values, 0.50)),
+            "p95_ms": _ms(percentile(values, 0.95)),
+            "p99_ms": _ms(percentile(values, 0.99)),
+        }
+    total = sum(op["count"] for op in operations.values())
+    return {"elapsed_s": round(elapsed, 3), "total_ops": total,
+            "throughput_per_s": round(total / elapsed, 2), "operations": operations}
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, baseline, tolerance):
+    regressions = []
+    for name, op in result["operations"].items():
+        before = baseline.get("operations", {}).get(name)
+        if not before or not before.get("p95_ms") or op["p95_ms"] is None:
+            continue
+        change = op["p95_ms"] / before["p95_ms"] - 1
+        if change > tolerance:
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {op['p95_ms']} ms (+{change:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed retail workload benchmark")
+    parser.add_argument("db", help="database prepared with benchmarks/datagen.py")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON result to this file")
+    parser.add_argument("--compare", help="baseline JSON result to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth (default: 0.2)")
+    parser.add_argument("--profile", action="store_true", help="include per-statement timings")
+    args = parser.parse_args()
+
+    profiler = QueryProfiler() if args.profile else None
+    store = RetailStore(args.db, profiler=profiler)
+    result = run(store, parse_mix(args.mix, OPERATIONS), args.threads, args.duration, args.seed)
+    store.close()
+    if profiler is not None:
+        result["statements"] = [
+            {"sql": s.sql, "calls": s.calls, "total_ms": round(s.total_ms, 3), "p95_ms": s.percentile_ms(0.95),
+             "max_ms": round(s.max_ms, 3), "rows": s.rows}
+            for s in profiler.top(20)
+        ]
+    result["config"] = {"db": os.path.abspath(args.db), "threads": args.threads, "duration_s": args.duration,
+                        "mix": args.mix, "seed": args.seed, "profile": args.profile}
+    result["environment"] = {"revision": git_revision(), "python": platform.python_version(),
+                             "sqlite": sqlite3.sqlite_version, "platform": platform.platform()}
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for line in regressions:
+            print("REGRESSION " + line, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
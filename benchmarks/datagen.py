@@ -0,0 +1,140 @@
+# Synthetic retail data sets for the benchmarks.
+#
+#   python benchmarks/datagen.py retail-bench.db --scale medium
+#
+# Product popularity follows a Zipf distribution (a few best sellers, a long
+# tail), order dates are spread over the last `days` days, and every user
+# shares one pre-computed password hash so generation is not dominated by
+# scrypt.
+import argparse
+import bisect
+import datetime
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from auth import PasswordHasher  # noqa: E402
+from migrations import analyze  # noqa: E402
+from retail_db import RetailStore  # noqa: E402
+
+SCALES = {
+    "small": {"users": 1000, "products": 2000, "orders": 20000},
+    "medium": {"users": 20000, "products": 50000, "orders": 500000},
+    "large": {"users": 200000, "products": 200000, "orders": 5000000},
+}
+
+PASSWORD = "bench-password"
+
+ADJECTIVES = ["Smart", "Wireless", "Portable", "Gaming", "Compact", "Ultra", "Classic",
+              "Premium", "Digital", "Foldable", "Rugged", "Silent", "Rapid", "Solar"]
+NOUNS = ["Laptop", "Smartphone", "Headphones", "Tablet", "Smartwatch", "Speaker", "Camera",
+         "Keyboard", "Mouse", "Monitor", "Charger", "Router", "Drone", "Projector", "Lamp"]
+
+
+class ZipfSampler:
+    # Draws ranks 1..n with P(k) proportional to 1 / k**s
+    def __init__(self, n, s=1.1, rng=None):
+        self.rng = rng or random.Random()
+        self.cumulative = list(itertools.accumulate(1.0 / k ** s for k in range(1, n + 1)))
+
+    def sample(self):
+        return bisect.bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1]) + 1
+
+
+def parse_mix(text, operations):
+    # "browse=70,checkout=20" -> {"browse": 70.0, "checkout": 20.0}; names
+    # outside `operations` are an error
+    mix = {}
+    for part in text.split(","):
+        name, weight = part.split("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - set(operations)
+    if unknown:
+        raise SystemExit(f"Unknown operations in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def generate(store, users, products, orders, days=365, zipf_s=1.1, max_lines=5, seed=1,
+             batch_size=10000):
+    rng = random.Random(seed)
+    password_hash = PasswordHasher().hash(PASSWORD)
+    conn = store.pool.connection()
+    with store.pool.transaction(immediate=True):
+        last_user = conn.execute("SELECT IFNULL(MAX(user_id), 0) FROM users").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO users (username, password, role) VALUES (?, ?, 'customer')",
+            ((f"user{last_user + i}", password_hash) for i in range(users)),
+        )
+        user_ids = [row[0] for row in conn.execute(
+            "SELECT user_id FROM users WHERE user_id > ? ORDER BY user_id", (last_user,))]
+
+        prices = [round(rng.uniform(5, 1500), 2) for _ in range(products)]
+        last_product = conn.execute("SELECT IFNULL(MAX(product_id), 0) FROM products").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO products (name, price, stock_quantity) VALUES (?, ?, ?)",
+            ((f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}", prices[i], 1000000)
+             for i in range(products)),
+        )
+        product_ids = [row[0] for row in conn.execute(
+            "SELECT product_id FROM products WHERE product_id > ? ORDER BY product_id", (last_product,))]
+
+        # Popular products are scattered through the id range, not bunched at
+        # the lowest ids
+        ranking = list(range(products))
+        rng.shuffle(ranking)
+        zipf = ZipfSampler(products, zipf_s, rng)
+        now = datetime.datetime.now().replace(microsecond=0)
+        next_order = (conn.execute("SELECT IFNULL(MAX(order_id), 0) FROM orders").fetchone()[0]) + 1
+
+        for batch_start in range(0, orders, batch_size):
+            order_rows = []
+            item_rows = []
+            for order_id in range(next_order + batch_start, next_order + min(orders, batch_start + batch_size)):
+                lines = {}
+                for _ in range(rng.randint(1, max_lines)):
+                    index = ranking[zipf.sample() - 1]
+                    lines[index] = lines.get(index, 0) + rng.randint(1, 3)
+                total = sum(prices[i] * quantity for i, quantity in lines.items())
+                date = now - datetime.timedelta(seconds=rng.randrange(days * 86400))
+                order_rows.append((order_id, rng.choice(user_ids),
+                                   date.strftime("%Y-%m-%d %H:%M:%S"), total, "paid"))
+                item_rows.extend((order_id, product_ids[i], quantity, prices[i])
+                                 for i, quantity in lines.items())
+            conn.executemany(
+                "INSERT INTO orders (order_id, user_id, order_date, total_amount, payment_status) "
+                "VALUES (?, ?, ?, ?, ?)", order_rows)
+            conn.executemany(
+                "INSERT INTO order_items (order_id, product_id, quantity, price_each) VALUES (?, ?, ?, ?)",
+                item_rows)
+    analyze(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic retail database")
+    parser.add_argument("db")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--products", type=int)
+    parser.add_argument("--orders", type=int)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of product popularity")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    sizes = dict(SCALES[args.scale])
+    for key in sizes:
+        if getattr(args, key) is not None:
+            sizes[key] = getattr(args, key)
+    store = RetailStore(args.db)
+    start = time.perf_counter()
+    generate(store, days=args.days, zipf_s=args.zipf, seed=args.seed, **sizes)
+    print(f"generated {sizes} in {time.perf_counter() - start:.1f}s")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import datetime
+import time
+
+from checkout import InsufficientStockError
+from db_retry import notify_stock, retry_busy
+
+
+class ReservationExpiredError(Exception):
+    # The cart the customer is looking at no longer matches the reserved one,
+    # usually because the sweeper released lines that sat too long
+    def __init__(self, product_ids):
+        super().__init__(f"Reservations expired for products {sorted(product_ids)}")
+        self.product_ids = product_ids
+
+
+class CartService:
+    # Server-side carts whose lines hold stock.
+    #
+    # Putting something in a cart takes it out of products.stock_quantity
+    # (guarded like checkout, so stock never goes negative) and records it in
+    # cart_items with a reserved_until time `hold_seconds` ahead; every change
+    # to the cart renews the hold of all its lines. release_expired() hands
+    # lapsed reservations back in one transaction. Because the stock is
+    # already held, checkout() only turns cart_items into an order.
+    #
+    # Changes are applied in batches, {product_id: quantity} with quantity 0
+    # meaning remove, so a client can collect several clicks and commit them
+    # together. Lines are priced from products.price when they are written.
+    #
+    # stock_listeners are called with the product ids whose stock changed.
+    def __init__(self, pool, hold_seconds=900, max_retries=8, retry_delay=0.01):
+        self.pool = pool
+        self.hold_seconds = hold_seconds
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.stock_listeners = []
+
+    def get_cart(self, user_id):
+        # [(product_id, name, quantity, price_each, reserved_until)]
+        return self.pool.connection().execute("""
+            SELECT ci.product_id, p.name, ci.quantity, ci.price_each, ci.reserved_until
+            FROM carts c
+            JOIN cart_items ci ON ci.cart_id = c.cart_id
+            JOIN products p ON p.product_id = ci.product_id
+            WHERE c.user_id = ?
+            ORDER BY p.name
+        """, (user_id,)).fetchall()
+
+    def apply(self, user_id, changes):
+        # Returns {product_id: most that can be held} for the lines that
+        # could not be raised to the requested quantity; those keep their
+        # previous quantity, the rest of the batch is applied
+        changes = dict(changes)
+        if not changes:
+            return {}
+        rejected = self._write(self._apply_once, user_id, changes)
+        notify_stock(self.stock_listeners, [pid for pid in changes if pid not in rejected])
+        return rejected
+
+    def _apply_once(self, user_id, changes):
+        now = time.time()
+        with self.pool.transaction(immediate=True) as conn:
+            return self._apply_changes(conn, user_id, changes, now)
+
+    def _apply_changes(self, conn, user_id, changes, now):
+        cart_id = self._cart_id(conn, user_id)
+        held = dict(conn.execute(
+            "SELECT product_id, quantity FROM cart_items WHERE cart_id = ?", (cart_id,)
+        ).fetchall())
+        rejected = {}
+        releases = []
+        upserts = []
+        removals = []
+        for pid, quantity in changes.items():
+            if quantity < 0:
+                raise ValueError("Cart quantities cannot be negative.")
+            delta = quantity - held.get(pid, 0)
+            if delta > 0:
+                cur = conn.execute(
+                    "UPDATE products SET stock_quantity = stock_quantity - ? "
+                    "WHERE product_id = ? AND stock_quantity >= ?",
+                    (delta, pid, delta),
+                )
+                if cur.rowcount != 1:
+                    row = conn.execute("SELECT stock_quantity FROM products WHERE product_id = ?",
+                                       (pid,)).fetchone()
+                    rejected[pid] = (row[0] if row else 0) + held.get(pid, 0)
+                    continue
+            elif delta < 0:
+                releases.append((-delta, pid))
+            if quantity == 0:
+                removals.append((cart_id, pid))
+            else:
+                upserts.append((cart_id, quantity, pid))
+        conn.executemany("UPDATE products SET stock_quantity = stock_quantity + ? WHERE product_id = ?",
+                         releases)
+        conn.executemany("DELETE FROM cart_items WHERE cart_id = ? AND product_id = ?", removals)
+        conn.executemany("""
+            INSERT INTO cart_items (cart_id, product_id, quantity, price_each, reserved_until)
+            SELECT ?, product_id, ?, price, 0 FROM products WHERE product_id = ?
+            ON CONFLICT(cart_id, product_id) DO UPDATE SET
+                quantity = excluded.quantity, price_each = excluded.price_each
+        """, upserts)
+        conn.execute("UPDATE cart_items SET reserved_until = ? WHERE cart_id = ?",
+                     (now + self.hold_seconds, cart_id))
+        return rejected
+
+    def _cart_id(self, conn, user_id):
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn.execute(
+            "INSERT INTO carts (user_id, updated_at) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET updated_at = excluded.updated_at",
+            (user_id, now),
+        )
+        return conn.execute("SELECT cart_id FROM carts WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    def checkout(self, user_id, changes=None, expected=None, payment_status="paid", order_date=None):
+        # Applies any last unsaved changes, then converts the cart into an
+        # order in the same transaction. With `expected` ({product_id:
+        # quantity}, what the customer confirmed) the order is only placed if
+        # the reserved cart still matches it.
+        if order_date is None:
+            order_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        order_id, product_ids = self._write(self._checkout_once, user_id, dict(changes or {}),
+                                            expected, payment_status, order_date)
+        notify_stock(self.stock_listeners, product_ids)
+        return order_id
+
+    def _checkout_once(self, user_id, changes, expected, payment_status, order_date):
+        with self.pool.transaction(immediate=True) as conn:
+            cart_id = self._cart_id(conn, user_id)
+            if changes:
+                rejected = self._apply_changes(conn, user_id, changes, time.time())
+                if rejected:
+                    pid, available = next(iter(rejected.items()))
+                    raise InsufficientStockError(pid, changes[pid], available)
+            lines = conn.execute(
+                "SELECT product_id, quantity, price_each FROM cart_items WHERE cart_id = ?", (cart_id,)
+            ).fetchall()
+            if expected is not None:
+                reserved = {pid: quantity for pid, quantity, _ in lines}
+                changed = {pid for pid in set(expected) | set(reserved)
+                           if expected.get(pid) != reserved.get(pid)}
+                if changed:
+                    raise ReservationExpiredError(changed)
+            if not lines:
+                raise ValueError("Cannot place an empty order.")
+
+            total_amount = sum(quantity * price for _, quantity, price in lines)
+            order_id = conn.execute(
+                "INSERT INTO orders (user_id, order_date, total_amount, payment_status) VALUES (?, ?, ?, ?)",
+                (user_id, order_date, total_amount, payment_status),
+            ).lastrowid
+            conn.execute(
+                "INSERT INTO order_items (order_id, product_id, quantity, price_each) "
+                "SELECT ?, product_id, quantity, price_each FROM cart_items WHERE cart_id = ?",
+                (order_id, cart_id),
+            )
+            conn.execute("DELETE FROM cart_items WHERE cart_id = ?", (cart_id,))
+        return order_id, [pid for pid, _, _ in lines]
+
+    def release_expired(self, now=None):
+        # Returns the number of products whose reservations were released
+        now = time.time() if now is None else now
+        product_ids = self._write(self._release_once, now)
+        notify_stock(self.stock_listeners, product_ids)
+        return len(product_ids)
+
+    def _release_once(self, now):
+        with self.pool.transaction(immediate=True) as conn:
+            expired = conn.execute(
+                "SELECT product_id, SUM(quantity) FROM cart_items WHERE reserved_until < ? GROUP BY product_id",
+                (now,),
+            ).fetchall()
+            if not expired:
+                return []
+            conn.executemany("UPDATE products SET stock_quantity = stock_quantity + ? WHERE product_id = ?",
+                             [(quantity, pid) for pid, quantity in expired])
+            conn.execute("DELETE FROM cart_items WHERE reserved_until < ?", (now,))
+        return [pid for pid, _ in expired]
+
+    def _write(self, fn, *args):
+        return retry_busy(fn, *args, max_retries=self.max_retries, retry_delay=self.retry_delay)
@@ -0,0 +1,176 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ProductRecord:
+    # One cached product. Unpacks like a products row:
+    #   product_id, name, price, stock = record
+    __slots__ = ("product_id", "name", "price", "stock")
+
+    def __init__(self, product_id, name, price, stock):
+        self.product_id = product_id
+        self.name = name
+        self.price = price
+        self.stock = stock
+
+    def __iter__(self):
+        return iter((self.product_id, self.name, self.price, self.stock))
+
+    def __repr__(self):
+        return f"ProductRecord({self.product_id}, {self.name!r}, {self.price}, {self.stock})"
+
+
+class CatalogCache:
+    # Product records held in memory, keyed by product_id, at most
+    # `max_entries` of them (least recently used evicted first). page() and
+    # get_many() answer from memory when they can and fall back to the
+    # ProductRepository, keeping what they read.
+    #
+    # Keeping it correct:
+    # - Writes made through this RetailStore (checkout, ProductRepository.add)
+    #   call stock_changed()/product_added(), which drop the affected records
+    #   so the next read fetches the committed values.
+    # - Any commit at all, from here or from anywhere else (another process,
+    #   manage.py imports), is noticed through PRAGMA data_version on a
+    #   connection of the cache's own, checked at most every `poll_interval`
+    #   seconds, and clears the cache. data_version cannot tell this store's
+    #   commits from foreign ones, so local writes flush the cache too rather
+    #   than hide a foreign change. Cached stock is for display and dialog
+    #   limits only: checkout re-checks stock inside its transaction.
+    def __init__(self, products, db_path, max_entries=50000, max_pages=1000, poll_interval=1.0):
+        self.products = products
+        self.max_entries = max_entries
+        self.max_pages = max_pages
+        self.poll_interval = poll_interval
+        self.hits = 0
+        self.misses = 0
+        self.records = OrderedDict()
+        # (after_id, limit) -> product ids of that page
+        self.pages = OrderedDict()
+        # Bumped by every invalidation; reads started before it do not store
+        # what they fetched
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._version_conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._data_version = self._read_data_version()
+        self._next_poll = time.monotonic() + poll_interval
+
+    def _read_data_version(self):
+        return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _poll(self):
+        # Call with the lock held
+        now = time.monotonic()
+        if now < self._next_poll:
+            return
+        self._next_poll = now + self.poll_interval
+        version = self._read_data_version()
+        if version != self._data_version:
+            self._data_version = version
+            self._clear()
+
+    def _clear(self):
+        self.records.clear()
+        self.pages.clear()
+        self._generation += 1
+
+    def _store(self, rows, generation):
+        # Call with the lock held; returns the records for rows
+        records = [ProductRecord(*row) for row in rows]
+        if generation == self._generation:
+            for record in records:
+                self.records[record.product_id] = record
+                self.records.move_to_end(record.product_id)
+            while len(self.records) > self.max_entries:
+                self.records.popitem(last=False)
+        return records
+
+    def _cached(self, product_ids):
+        # Call with the lock held; None unless every id is cached
+        records = []
+        for product_id in product_ids:
+            record = self.records.get(product_id)
+            if record is None:
+                return None
+            self.records.move_to_end(product_id)
+            records.append(record)
+        return records
+
+    def page(self, after_id=0, limit=100):
+        # Same contract as ProductRepository.page
+        key = (after_id, limit)
+        with self._lock:
+            self._poll()
+            ids = self.pages.get(key)
+            records = self._cached(ids) if ids is not None else None
+            if records is not None:
+                self.pages.move_to_end(key)
+                self.hits += 1
+                return records
+            self.misses += 1
+            generation = self._generation
+        rows = self.products.page(after_id, limit)
+        with self._lock:
+            records = self._store(rows, generation)
+            if generation == self._generation:
+                self.pages[key] = [record.product_id for record in records]
+                while len(self.pages) > self.max_pages:
+                    self.pages.popitem(last=False)
+        return records
+
+    def get_many(self, product_ids):
+        # Records for the ids that exist, cached ones first, then the rest in
+        # one query
+        product_ids = list(product_ids)
+        with self._lock:
+            self._poll()
+            found = []
+            missing = []
+            for product_id in product_ids:
+                record = self.records.get(product_id)
+                if record is None:
+                    missing.append(product_id)
+                else:
+                    self.records.move_to_end(product_id)
+                    found.append(record)
+            self.hits += len(found)
+            self.misses += len(missing)
+            generation = self._generation
+        if missing:
+            rows = self.products.get_many(missing)
+            with self._lock:
+                found.extend(self._store(rows, generation))
+        return found
+
+    def get(self, product_id):
+        records = self.get_many([product_id])
+        return records[0] if records else None
+
+    def remember(self, rows):
+        # Keep rows read elsewhere (search results) for later lookups
+        with self._lock:
+            self._store(rows, self._generation)
+
+    def stock_changed(self, product_ids):
+        # Called after a committed write that changed these products' stock
+        with self._lock:
+            for product_id in product_ids:
+                self.records.pop(product_id, None)
+            self._generation += 1
+
+    def product_added(self, product_id):
+        # A new product can belong on any page whose range covers its id
+        with self._lock:
+            self.pages.clear()
+            self._generation += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+
+    def close(self):
+        with self._lock:
+            self._clear()
+            self._version_conn.close()
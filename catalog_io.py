@@ -0,0 +1,145 @@
+import csv
+import json
+import math
+import os
+
+EXPORT_TABLES = {
+    "products": ("product_id", "name", "price", "stock_quantity"),
+    "orders": ("order_id", "user_id", "order_date", "total_amount", "payment_status"),
+    "order_items": ("id", "order_id", "product_id", "quantity", "price_each"),
+}
+
+UPSERT_PRODUCT = (
+    "INSERT INTO products (product_id, name, price, stock_quantity) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(product_id) DO UPDATE SET "
+    "name = excluded.name, price = excluded.price, stock_quantity = excluded.stock_quantity"
+)
+
+
+def parse_product(name, price, stock):
+    # Same rules as the admin "Add New Product" form. Raises ValueError with
+    # the message to show the user.
+    name = str(name or "").strip()
+    price = str(price if price is not None else "").strip()
+    stock = str(stock if stock is not None else "").strip()
+    if not name or not price or not stock:
+        raise ValueError("Please enter product name, price and stock quantity.")
+    try:
+        price = float(price)
+        stock = int(stock)
+        # float() also accepts "nan", "inf" and overflows such as "1e400"
+        if not math.isfinite(price) or price < 0 or stock < 0:
+            raise ValueError
+    except ValueError:
+        raise ValueError("Price must be positive number and stock must be a positive integer.") from None
+    return name, price, stock
+
+
+def iter_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+class InvalidRecord:
+    # Yielded in place of a line that could not be read as a record, so the
+    # import counts it as rejected and carries on
+    def __init__(self, message):
+        self.message = message
+
+
+def iter_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield InvalidRecord(f"Invalid JSON on line {number} ({e.msg}).")
+                continue
+            if isinstance(record, dict):
+                yield record
+            else:
+                yield InvalidRecord(f"Line {number} is not a JSON object.")
+
+
+def iter_records(path):
+    # Streams records one at a time; the file is never loaded whole
+    if os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson"):
+        return iter_jsonl(path)
+    return iter_csv(path)
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        # (record number, message) for the first rejects; the count above
+        # keeps going past the cap
+        self.errors = []
+
+
+def import_products(pool, records, batch_size=10000, progress=None, max_errors=1000):
+    # Validates each record and upserts valid ones in executemany batches,
+    # all inside one transaction. Records with a product_id update that
+    # product; records without one are inserted as new products.
+    # progress(processed, imported, rejected) is called after every batch.
+    result = ImportResult()
+    batch = []
+    processed = 0
+
+    def flush(conn):
+        conn.executemany(UPSERT_PRODUCT, batch)
+        result.imported += len(batch)
+        batch.clear()
+
+    with pool.transaction(immediate=True) as conn:
+        for number, record in enumerate(records, start=1):
+            processed = number
+            try:
+                if isinstance(record, InvalidRecord):
+                    raise ValueError(record.message)
+                name, price, stock = parse_product(
+                    record.get("name"), record.get("price"),
+                    record.get("stock_quantity", record.get("stock")))
+                product_id = record.get("product_id")
+                product_id = int(product_id) if product_id not in (None, "") else None
+            except (ValueError, TypeError, AttributeError) as e:
+                result.rejected += 1
+                if len(result.errors) < max_errors:
+                    result.errors.append((number, str(e)))
+                continue
+            batch.append((product_id, name, price, stock))
+            if len(batch) >= batch_size:
+                flush(conn)
+                if progress is not None:
+                    progress(processed, result.imported, result.rejected)
+        if batch:
+            flush(conn)
+    if progress is not None:
+        progress(processed, result.imported, result.rejected)
+    return result
+
+
+def export_table(pool, table, path, chunk_size=5000):
+    # Streams a table to CSV or JSONL (by extension) chunk by chunk, so memory
+    # stays flat whatever the table size. Returns the number of rows written.
+    columns = EXPORT_TABLES[table]
+    jsonl = os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson")
+    cursor = pool.connection().execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY {columns[0]}")
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = None if jsonl else csv.writer(f)
+        if writer is not None:
+            writer.writerow(columns)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            if writer is not None:
+                writer.writerows(rows)
+            else:
+                f.writelines(json.dumps(dict(zip(columns, row))) + "\n" for row in rows)
+            count += len(rows)
+    return count
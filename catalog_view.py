@@ -0,0 +1,132 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class ProductCatalogView:
+    # Lazily filled product list for the customer dashboard.
+    #
+    # Rows are fetched a page at a time with keyset pagination (product_id >
+    # last seen id), starting with enough rows to fill the visible area plus a
+    # prefetch margin. Whenever the user scrolls to within `prefetch` rows of
+    # the end of what has been loaded, the next page is appended. A Treeview
+    # cannot recycle its items, so rows stay once loaded, but a catalog is only
+    # read as far as the user actually scrolls.
+    #
+    # on_error(error) reports a failed page read; scrolling then retries it.
+    def __init__(self, parent, products, executor=None, group=None, page_size=100, prefetch=50, on_error=None):
+        self.products = products
+        self.executor = executor
+        self.group = group
+        self.on_error = on_error
+        self.page_size = page_size
+        self.prefetch = prefetch
+
+        frame = tk.Frame(parent)
+        frame.pack(fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(frame, columns=("name", "price", "stock"), show="headings", height=20)
+        self.tree.heading("name", text="Product Name")
+        self.tree.heading("price", text="Price")
+        self.tree.heading("stock", text="In Stock")
+        self.tree.column("name", width=200, anchor=tk.W)
+        self.tree.column("price", width=100, anchor=tk.CENTER)
+        self.tree.column("stock", width=100, anchor=tk.CENTER)
+        self.scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.last_id = 0
+        self.exhausted = False
+        self._load_pending = False
+        # Bumped on every reload/show_rows so pages fetched for an older
+        # listing are dropped when they arrive
+        self._generation = 0
+
+    def _fetch(self, fn, args, callback, on_error=None):
+        # Through the UI executor when there is one, so the Tk loop never
+        # waits on the database
+        if self.executor is None:
+            try:
+                rows = fn(*args)
+            except Exception as e:
+                if on_error is None:
+                    raise
+                on_error(e)
+                return
+            callback(rows)
+        else:
+            self.executor.submit(fn, *args, on_success=callback, on_error=on_error, group=self.group)
+
+    def reload(self):
+        self._clear()
+        self.last_id = 0
+        self.exhausted = False
+        self.load_more(int(self.tree.cget("height")) + self.prefetch)
+
+    def load_more(self, count=None):
+        if self.exhausted:
+            self._load_pending = False
+            return
+        count = count or self.page_size
+        self._load_pending = True
+        generation = self._generation
+
+        def append(rows):
+            if generation != self._generation or not self.tree.winfo_exists():
+                return
+            self._load_pending = False
+            for product_id, name, price, stock in rows:
+                self.tree.insert("", tk.END, iid=str(product_id), values=self._values(name, price, stock))
+            if rows:
+                self.last_id = rows[-1][0]
+            if len(rows) < count:
+                self.exhausted = True
+
+        def failed(error):
+            if generation == self._generation:
+                # Not pending any more, so the next scroll asks again
+                self._load_pending = False
+            if self.on_error is not None:
+                self.on_error(error)
+        self._fetch(self.products.page, (self.last_id, count), append, failed)
+
+    def show_rows(self, rows):
+        # Replace the list with a fixed result set (search results); paging
+        # stays off until the next reload()
+        self._clear()
+        for product_id, name, price, stock in rows:
+            self.tree.insert("", tk.END, iid=str(product_id), values=self._values(name, price, stock))
+        self.exhausted = True
+
+    def refresh_rows(self, product_ids):
+        # Re-read only the given products and touch only rows that changed,
+        # e.g. the stock of the lines of an order that was just placed
+        def apply(rows):
+            if not self.tree.winfo_exists():
+                return
+            for product_id, name, price, stock in rows:
+                iid = str(product_id)
+                if not self.tree.exists(iid):
+                    continue
+                values = self._values(name, price, stock)
+                if tuple(str(v) for v in self.tree.item(iid, "values")) != tuple(str(v) for v in values):
+                    self.tree.item(iid, values=values)
+        self._fetch(self.products.get_many, (list(product_ids),), apply)
+
+    def _clear(self):
+        self._generation += 1
+        self._load_pending = False
+        for row in self.tree.get_children():
+            self.tree.delete(row)
+
+    def _values(self, name, price, stock):
+        return (name, f"${price:.2f}", stock)
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        loaded = len(self.tree.get_children())
+        if (not self.exhausted and not self._load_pending and loaded
+                and (1.0 - float(last)) * loaded < self.prefetch):
+            # Let the current scroll finish before growing the list
+            self._load_pending = True
+            self.tree.after_idle(self.load_more)
@@ -0,0 +1,97 @@
+import datetime
+
+from db_retry import notify_stock, retry_busy
+
+
+class InsufficientStockError(Exception):
+    def __init__(self, product_id, requested, available):
+        super().__init__(f"Insufficient stock for product {product_id}: "
+                         f"requested {requested}, available {available}")
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+
+
+class CheckoutEngine:
+    # Places an order as one BEGIN IMMEDIATE transaction: every stock decrement
+    # is guarded by "stock_quantity >= ?", so stock can never go negative, and
+    # if any line falls short nothing is written at all. Lines are priced from
+    # products.price inside that transaction, never by the caller.
+    #
+    # stock_listeners are called with the product ids of each committed order
+    # (e.g. to invalidate cached stock levels).
+    def __init__(self, pool, max_retries=8, retry_delay=0.01):
+        self.pool = pool
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.retries = 0
+        self.stock_listeners = []
+
+    def place_order(self, user_id, items, payment_status="paid", order_date=None):
+        # items: iterable of (product_id, quantity)
+        lines = self._merge_lines(items)
+        if not lines:
+            raise ValueError("Cannot place an empty order.")
+        if order_date is None:
+            order_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        order_id = retry_busy(self._place_order_once, user_id, lines, payment_status, order_date,
+                              max_retries=self.max_retries, retry_delay=self.retry_delay,
+                              on_retry=self._count_retry)
+        notify_stock(self.stock_listeners, [pid for pid, _ in lines])
+        return order_id
+
+    def _count_retry(self):
+        self.retries += 1
+
+    def _merge_lines(self, items):
+        merged = {}
+        for pid, quantity in items:
+            if quantity <= 0:
+                raise ValueError("Order quantities must be positive.")
+            merged[pid] = merged.get(pid, 0) + quantity
+        return list(merged.items())
+
+    def _place_order_once(self, user_id, lines, payment_status, order_date):
+        with self.pool.transaction(immediate=True) as conn:
+            cur = conn.executemany(
+                "UPDATE products SET stock_quantity = stock_quantity - ? "
+                "WHERE product_id = ? AND stock_quantity >= ?",
+                [(quantity, pid, quantity) for pid, quantity in lines],
+            )
+            if cur.rowcount != len(lines):
+                # Undo the decrements that did apply before reading the real
+                # stock levels for the error message
+                conn.rollback()
+                raise self._shortfall(conn, lines)
+
+            # Every product exists, or its decrement would have missed
+            placeholders = ",".join("?" * len(lines))
+            prices = dict(conn.execute(
+                f"SELECT product_id, price FROM products WHERE product_id IN ({placeholders})",
+                [pid for pid, _ in lines],
+            ).fetchall())
+            total_amount = sum(quantity * prices[pid] for pid, quantity in lines)
+            cur = conn.execute(
+                "INSERT INTO orders (user_id, order_date, total_amount, payment_status) VALUES (?, ?, ?, ?)",
+                (user_id, order_date, total_amount, payment_status),
+            )
+            order_id = cur.lastrowid
+            conn.executemany(
+                "INSERT INTO order_items (order_id, product_id, quantity, price_each) VALUES (?, ?, ?, ?)",
+                [(order_id, pid, quantity, prices[pid]) for pid, quantity in lines],
+            )
+        return order_id
+
+    def _shortfall(self, conn, lines):
+        placeholders = ",".join("?" * len(lines))
+        stock = dict(conn.execute(
+            f"SELECT product_id, stock_quantity FROM products WHERE product_id IN ({placeholders})",
+            [pid for pid, _ in lines],
+        ).fetchall())
+        for pid, quantity in lines:
+            available = stock.get(pid, 0)
+            if quantity > available:
+                return InsufficientStockError(pid, quantity, available)
+        # Stock was replenished between the failed update and this read
+        return InsufficientStockError(lines[0][0], lines[0][1], stock.get(lines[0][0], 0))
@@ -0,0 +1,276 @@
+# RetailStore look-alike that talks to server.py instead of opening the
+# database, so the Tk application can run as a thin client:
+#
+#   python OnlineRetailApp.py --server http://127.0.0.1:8080
+#
+# Only the operations the GUI uses are provided. Calls that act for a user
+# (cart, orders, history) send the session token that user logged in with;
+# the user_id arguments are kept so the GUI code is the same in both modes.
+import http.client
+import json
+import socket
+import sqlite3
+import threading
+from urllib.parse import urlencode, urlsplit
+
+from carts import ReservationExpiredError
+from catalog_cache import ProductRecord
+from checkout import InsufficientStockError
+
+# Most product ids server.py takes in one ?ids= request
+MAX_IDS = 1000
+
+
+class RemoteError(Exception):
+    def __init__(self, status, code, message):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+class RemoteStore:
+    def __init__(self, url, timeout=30):
+        parts = urlsplit(url)
+        if parts.scheme != "http" or not parts.hostname:
+            raise ValueError(f"Expected an http://host:port URL, got {url!r}")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        # No local database: the UI executor has no connection to interrupt
+        self.pool = None
+        # Token of the user logged in now, and user_id -> token for everyone
+        # logged in through this client whose session is still open (a cart
+        # batch may still be written after its owner logged out)
+        self.token = None
+        self.tokens = {}
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.auth = RemoteAuth(self)
+        self.products = RemoteProducts(self)
+        self.catalog = RemoteCatalog(self)
+        self.search = RemoteSearch(self)
+        self.orders = RemoteOrders(self)
+        self.carts = RemoteCarts(self)
+        self.analytics = RemoteAnalytics(self)
+        self.inventory = RemoteInventory(self)
+        self.stock_alerts = RemoteStockAlerts(self)
+
+    def _connection(self):
+        # One keep-alive connection per calling thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def request(self, method, path, body=None, query=None, user_id=None, token=None):
+        if query:
+            path = f"{path}?{urlencode(query)}"
+        headers = {"Accept": "application/json"}
+        if token is None:
+            token = self.tokens.get(user_id) if user_id is not None else self.token
+        if token is not None:
+            headers["Authorization"] = f"Bearer {token}"
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        conn = self._connection()
+        reused = conn.sock is not None
+        try:
+            conn.request(method, path, data, headers)
+            response = conn.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # The server closed an idle keep-alive connection before reading
+            # the request; send it once more on a fresh one
+            conn.close()
+            if not reused:
+                raise
+            conn.request(method, path, data, headers)
+            response = conn.getresponse()
+        except (OSError, socket.timeout):
+            conn.close()
+            raise
+        payload = json.loads(response.read() or b"{}")
+        if response.status >= 400:
+            raise self._error(response.status, payload)
+        return payload
+
+    def _error(self, status, payload):
+        code = payload.get("error")
+        message = payload.get("message", f"HTTP {status}")
+        if code == "insufficient_stock":
+            return InsufficientStockError(payload["product_id"], payload["requested"], payload["available"])
+        if code == "reservation_expired":
+            return ReservationExpiredError(set(payload["product_ids"]))
+        if code == "duplicate_username":
+            return sqlite3.IntegrityError(message)
+        if code == "bad_request":
+            return ValueError(message)
+        return RemoteError(status, code, message)
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+
+class RemoteAuth:
+    def __init__(self, store):
+        self.store = store
+
+    def login(self, username, password):
+        try:
+            user = self.store.request("POST", "/api/login", {"username": username, "password": password})
+        except RemoteError as e:
+            if e.code == "invalid_credentials":
+                return None
+            raise
+        self.store.token = self.store.tokens[user["user_id"]] = user["token"]
+        return user
+
+    def logout(self, token):
+        try:
+            self.store.request("POST", "/api/logout", token=token)
+        finally:
+            if self.store.token == token:
+                self.store.token = None
+            for user_id, known in list(self.store.tokens.items()):
+                if known == token:
+                    del self.store.tokens[user_id]
+
+    def register(self, username, password, role="customer"):
+        # Accounts made through the service are always customer accounts
+        return self.store.request("POST", "/api/register",
+                                  {"username": username, "password": password})["user_id"]
+
+
+class RemoteProducts:
+    def __init__(self, store):
+        self.store = store
+
+    def add(self, name, price, stock):
+        return self.store.request("POST", "/api/products",
+                                  {"name": name, "price": price, "stock": stock})["product_id"]
+
+
+class RemoteCatalog:
+    # Pass-through: the server's catalog cache already answers these from
+    # memory, so the client keeps nothing between calls
+    def __init__(self, store):
+        self.store = store
+
+    def page(self, after_id=0, limit=100):
+        rows = self.store.request("GET", "/api/products", query={"after": after_id, "limit": limit})["products"]
+        return [ProductRecord(*row) for row in rows]
+
+    def get_many(self, product_ids):
+        product_ids = list(product_ids)
+        records = []
+        for start in range(0, len(product_ids), MAX_IDS):
+            chunk = product_ids[start:start + MAX_IDS]
+            rows = self.store.request("GET", "/api/products",
+                                      query={"ids": ",".join(str(pid) for pid in chunk)})["products"]
+            records.extend(ProductRecord(*row) for row in rows)
+        return records
+
+    def get(self, product_id):
+        records = self.get_many([product_id])
+        return records[0] if records else None
+
+    def remember(self, rows):
+        pass
+
+
+class RemoteSearch:
+    def __init__(self, store):
+        self.store = store
+
+    def search(self, text, limit=100):
+        rows = self.store.request("GET", "/api/products", query={"q": text, "limit": limit})["products"]
+        return [tuple(row) for row in rows]
+
+
+class RemoteOrders:
+    def __init__(self, store):
+        self.store = store
+
+    def order_history(self, user_id, before=None, limit=20):
+        query = {"limit": limit}
+        if before is not None:
+            query.update(before_date=before[0], before_id=before[1])
+        result = self.store.request("GET", "/api/orders", query=query, user_id=user_id)
+        orders = [(order_id, order_date, total, status, [tuple(line) for line in lines])
+                  for order_id, order_date, total, status, lines in result["orders"]]
+        return orders, (tuple(result["next"]) if result["next"] is not None else None)
+
+    def sales_statistics(self):
+        return [tuple(row) for row in self.store.request("GET", "/api/statistics")["statistics"]]
+
+
+class RemoteCarts:
+    def __init__(self, store):
+        self.store = store
+
+    def get_cart(self, user_id):
+        return [tuple(line) for line in self.store.request("GET", "/api/cart", user_id=user_id)["lines"]]
+
+    def apply(self, user_id, changes):
+        result = self.store.request("POST", "/api/cart", {
+            "changes": [[pid, quantity] for pid, quantity in changes.items()]}, user_id=user_id)
+        return {pid: available for pid, available in result["rejected"]}
+
+    def checkout(self, user_id, changes=None, expected=None):
+        body = {"changes": [[pid, quantity] for pid, quantity in (changes or {}).items()]}
+        if expected is not None:
+            body["expected"] = [[pid, quantity] for pid, quantity in expected.items()]
+        return self.store.request("POST", "/api/cart/checkout", body, user_id=user_id)["order_id"]
+
+    def release_expired(self, now=None):
+        # The server sweeps expired reservations itself
+        return 0
+
+
+class RemoteAnalytics:
+    def __init__(self, store):
+        self.store = store
+
+    def report(self, start, end, granularity="day", top_n=10, ma_window=7):
+        # numpy only once a report is asked for, as with a local store
+        import numpy as np
+
+        from analytics import SalesReport
+
+        result = self.store.request("GET", "/api/trends", query={
+            "start": start.isoformat(), "end": end.isoformat(), "granularity": granularity,
+            "top_n": top_n, "ma_window": ma_window})
+        return SalesReport(result["granularity"], np.array(result["periods"], dtype="datetime64[D]"),
+                           np.array(result["revenue"]), np.array(result["units"], dtype=np.int64),
+                           np.array(result["revenue_ma"]), [tuple(row) for row in result["top"]])
+
+
+class RemoteInventory:
+    def __init__(self, store):
+        self.store = store
+
+    def replenish(self, deltas):
+        items = deltas.items() if isinstance(deltas, dict) else deltas
+        result = self.store.request("POST", "/api/inventory/replenish",
+                                    {"deltas": [[pid, quantity] for pid, quantity in items]})
+        return {pid: stock for pid, stock in result["rejected"]}
+
+    def set_thresholds(self, thresholds):
+        self.store.request("POST", "/api/inventory/thresholds",
+                           {"thresholds": [[pid, level] for pid, level in thresholds.items()]})
+
+
+class RemoteStockAlerts:
+    # The server's monitor does the consuming; this only asks for its alerts
+    def __init__(self, store):
+        self.store = store
+
+    def poll(self):
+        return [tuple(alert) for alert in self.store.request("GET", "/api/inventory/alerts")["alerts"]]
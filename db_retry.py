@@ -0,0 +1,37 @@
+# Shared by the services that write to retail.db: retrying a transaction
+# that found the database busy, and telling stock listeners what changed.
+import random
+import sqlite3
+import time
+
+
+def is_busy_error(error):
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(error) or "busy" in str(error)
+
+
+def retry_busy(fn, *args, max_retries=8, retry_delay=0.01, on_retry=None):
+    # Returns fn(*args), calling it again while it fails with a busy or
+    # locked database, at most max_retries more times. on_retry() is called
+    # before each retry.
+    attempt = 0
+    while True:
+        try:
+            return fn(*args)
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e) or attempt >= max_retries:
+                raise
+            attempt += 1
+            if on_retry is not None:
+                on_retry()
+            # Exponential backoff with jitter so retrying writers spread out
+            time.sleep(retry_delay * (2 ** attempt) * random.random())
+
+
+def notify_stock(listeners, product_ids):
+    # Calls each stock listener with the product ids whose stock changed
+    if product_ids:
+        for listener in listeners:
+            listener(product_ids)
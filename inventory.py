@@ -0,0 +1,173 @@
+import threading
+
+from db_retry import notify_stock, retry_busy
+
+# Keeps IN (...) lists well under SQLite's bound-parameter limit
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class InventoryService:
+    # Restocking and low-stock thresholds. Every stock change, here or in
+    # checkout and carts, is logged to inventory_events by the triggers of
+    # migration 7, inside the transaction that made it.
+    #
+    # stock_listeners are called with the product ids whose stock changed.
+    def __init__(self, pool, max_retries=8, retry_delay=0.01):
+        self.pool = pool
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.stock_listeners = []
+
+    def replenish(self, deltas):
+        # deltas: {product_id: quantity} or iterable of (product_id,
+        # quantity); repeated ids are added up and negative quantities are
+        # corrections. All lines go in one transaction. Returns
+        # {product_id: current stock} for the lines that were not applied,
+        # None for unknown products, because they would take stock below zero.
+        merged = {}
+        for pid, quantity in (deltas.items() if isinstance(deltas, dict) else deltas):
+            merged[int(pid)] = merged.get(int(pid), 0) + int(quantity)
+        merged = {pid: quantity for pid, quantity in merged.items() if quantity}
+        if not merged:
+            return {}
+        rejected = self._write(self._replenish_once, merged)
+        notify_stock(self.stock_listeners, [pid for pid in merged if pid not in rejected])
+        return rejected
+
+    def _replenish_once(self, deltas):
+        with self.pool.transaction(immediate=True) as conn:
+            stock = {}
+            for chunk in _chunks(list(deltas)):
+                placeholders = ",".join("?" * len(chunk))
+                stock.update(conn.execute(
+                    f"SELECT product_id, stock_quantity FROM products WHERE product_id IN ({placeholders})",
+                    chunk,
+                ).fetchall())
+            rejected = {pid: stock.get(pid) for pid, quantity in deltas.items()
+                        if pid not in stock or stock[pid] + quantity < 0}
+            conn.executemany(
+                "UPDATE products SET stock_quantity = stock_quantity + ? WHERE product_id = ?",
+                [(quantity, pid) for pid, quantity in deltas.items() if pid not in rejected],
+            )
+        return rejected
+
+    def set_thresholds(self, thresholds):
+        # {product_id: threshold}; None goes back to the monitor's default
+        thresholds = {int(pid): (None if level is None else int(level)) for pid, level in thresholds.items()}
+        if any(level is not None and level < 0 for level in thresholds.values()):
+            raise ValueError("Stock thresholds cannot be negative.")
+        self._write(self._set_thresholds_once, thresholds)
+
+    def _set_thresholds_once(self, thresholds):
+        with self.pool.transaction(immediate=True) as conn:
+            conn.executemany("DELETE FROM stock_thresholds WHERE product_id = ?",
+                             [(pid,) for pid, level in thresholds.items() if level is None])
+            conn.executemany("""
+                INSERT INTO stock_thresholds (product_id, threshold) VALUES (?, ?)
+                ON CONFLICT(product_id) DO UPDATE SET threshold = excluded.threshold
+                WHERE threshold <> excluded.threshold
+            """, [(pid, level) for pid, level in thresholds.items() if level is not None])
+
+    def _write(self, fn, *args):
+        return retry_busy(fn, *args, max_retries=self.max_retries, retry_delay=self.retry_delay)
+
+
+class LowStockMonitor:
+    # Consumer of inventory_events that keeps the set of products at or below
+    # their low-stock threshold (stock_thresholds, else default_threshold).
+    #
+    # Nothing on the checkout path calls this: poll() is run on a timer (the
+    # admin dashboard, server.py on request) and reads only the events
+    # appended since the previous poll, at most batch_size per query. The
+    # first poll loads the current alerts with one scan of products.
+    # Threshold changes are logged as zero-delta events, so monitors in other
+    # processes pick them up too.
+    def __init__(self, pool, default_threshold=5, batch_size=5000):
+        self.pool = pool
+        self.default_threshold = default_threshold
+        self.batch_size = batch_size
+        # Last event_id consumed; None until the first poll
+        self.cursor = None
+        # product_id -> (name, stock, threshold)
+        self._alerts = {}
+        self._lock = threading.Lock()
+
+    def poll(self):
+        # Catches up with the ledger and returns alerts()
+        with self._lock:
+            if self.cursor is None:
+                self._load()
+            else:
+                self._consume()
+        return self.alerts()
+
+    def alerts(self):
+        # [(product_id, name, stock, threshold)], emptiest first
+        with self._lock:
+            alerts = [(pid, name, stock, threshold) for pid, (name, stock, threshold) in self._alerts.items()]
+        return sorted(alerts, key=lambda alert: (alert[2], alert[1]))
+
+    def _load(self):
+        with self.pool.transaction() as conn:
+            cursor = conn.execute("SELECT IFNULL(MAX(event_id), 0) FROM inventory_events").fetchone()[0]
+            rows = conn.execute("""
+                SELECT p.product_id, p.name, p.stock_quantity, IFNULL(t.threshold, ?) AS threshold
+                FROM products p
+                LEFT JOIN stock_thresholds t ON t.product_id = p.product_id
+                WHERE p.stock_quantity <= IFNULL(t.threshold, ?)
+            """, (self.default_threshold, self.default_threshold)).fetchall()
+        self._alerts = {pid: (name, stock, threshold) for pid, name, stock, threshold in rows}
+        # Only now: a poll interrupted before this point starts over
+        self.cursor = cursor
+
+    def _consume(self):
+        conn = self.pool.connection()
+        while True:
+            events = conn.execute(
+                "SELECT event_id, product_id, stock_after FROM inventory_events "
+                "WHERE event_id > ? ORDER BY event_id LIMIT ?",
+                (self.cursor, self.batch_size),
+            ).fetchall()
+            if not events:
+                return
+            # Only the latest level of each product matters. The cursor moves
+            # once the alerts are updated, so an interrupted poll reads the
+            # same events again
+            self._evaluate(conn, {pid: stock for _, pid, stock in events})
+            self.cursor = events[-1][0]
+            if len(events) < self.batch_size:
+                return
+
+    def _evaluate(self, conn, stock):
+        product_ids = list(stock)
+        thresholds = {}
+        for chunk in _chunks(product_ids):
+            placeholders = ",".join("?" * len(chunk))
+            thresholds.update(conn.execute(
+                f"SELECT product_id, threshold FROM stock_thresholds WHERE product_id IN ({placeholders})",
+                chunk,
+            ).fetchall())
+        low = []
+        for pid in product_ids:
+            threshold = thresholds.get(pid, self.default_threshold)
+            if stock[pid] <= threshold:
+                low.append(pid)
+            else:
+                self._alerts.pop(pid, None)
+        names = {}
+        for chunk in _chunks([pid for pid in low if pid not in self._alerts]):
+            placeholders = ",".join("?" * len(chunk))
+            names.update(conn.execute(
+                f"SELECT product_id, name FROM products WHERE product_id IN ({placeholders})", chunk,
+            ).fetchall())
+        for pid in low:
+            name = self._alerts[pid][0] if pid in self._alerts else names.get(pid)
+            if name is None:
+                # Product no longer exists
+                continue
+            self._alerts[pid] = (name, stock[pid], thresholds.get(pid, self.default_threshold))
@@ -0,0 +1,231 @@
+# Online maintenance for retail.db: backups, archival of old orders and
+# reclaiming free space. Every operation works in small steps with short
+# transactions, so checkouts running at the same time wait for one step at
+# most instead of for the whole job.
+import datetime
+import os
+import sqlite3
+import time
+
+ARCHIVE_SCHEMA = [
+    # Same columns as the live tables; ids are kept so archived orders can
+    # be matched with their lines and with anything that referenced them
+    """
+    CREATE TABLE IF NOT EXISTS archive.orders (
+        order_id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        order_date TEXT NOT NULL,
+        total_amount REAL NOT NULL,
+        payment_status TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS archive.order_items (
+        id INTEGER PRIMARY KEY,
+        order_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        price_each REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archive.idx_archive_items_order ON order_items (order_id)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_archive_orders_user_date ON orders (user_id, order_date, order_id)",
+]
+
+
+def _connect(db_path, busy_timeout_ms=5000):
+    conn = sqlite3.connect(db_path, timeout=busy_timeout_ms / 1000, isolation_level=None)
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    # As ConnectionPool: under WAL, NORMAL only syncs at checkpoints
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+def backup(db_path, target_path, pages=256, pause=0.005, progress=None):
+    # Hot copy of db_path with the online backup API, `pages` pages per step
+    # and `pause` seconds between steps so writers get the lock in between.
+    # progress(remaining, total) is called after every step. Returns the
+    # number of pages copied.
+    #
+    # The source connection keeps one read transaction open for the whole
+    # copy. Under WAL that pins a consistent snapshot: commits made
+    # meanwhile neither wait for the backup nor restart it (without it every
+    # commit from another connection starts the copy over from page 1).
+    # The copy is written next to target_path and renamed when complete.
+    partial = target_path + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    source = _connect(db_path)
+    target = sqlite3.connect(partial)
+    total = 0
+
+    def step(status, remaining, page_count):
+        nonlocal total
+        total = page_count
+        if progress is not None:
+            progress(remaining, page_count)
+
+    try:
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        source.backup(target, pages=pages, progress=step, sleep=pause)
+        source.execute("COMMIT")
+    finally:
+        target.close()
+        source.close()
+    os.replace(partial, target_path)
+    return total
+
+
+class ArchiveResult:
+    def __init__(self):
+        self.orders = 0
+        self.lines = 0
+        self.batches = 0
+
+
+def archive_orders(db_path, archive_path, cutoff, batch_size=200, pause=0.01, progress=None):
+    # Moves orders dated before `cutoff` (datetime.date or datetime) and
+    # their lines from retail.db into archive_path, oldest first, batch_size
+    # orders at a time with at least `pause` seconds between batches.
+    # progress(result) is called after every batch.
+    #
+    # Each batch is two transactions:
+    # 1. copy the orders and lines into the archive (only a read on
+    #    retail.db, so it never blocks checkouts);
+    # 2. in retail.db, add the lines' totals to archived_sales and delete the
+    #    rows that the archive now holds.
+    # SQLite does not make a transaction over a WAL database and an attached
+    # one atomic as a whole, hence the split: a crash between the two leaves
+    # rows in both places, and the next run copies them again (INSERT OR
+    # IGNORE) before deleting them, so nothing is lost or counted twice.
+    #
+    # product_sales_summary is not touched (it has no delete trigger), so the
+    # admin statistics keep counting archived sales; archived_sales lets
+    # rebuild_sales_summary() include them too. Order history and sales
+    # trends only cover orders still in retail.db.
+    if isinstance(cutoff, datetime.datetime):
+        cutoff = cutoff.strftime("%Y-%m-%d %H:%M:%S")
+    else:
+        cutoff = cutoff.isoformat()
+    conn = _connect(db_path)
+    result = ArchiveResult()
+    try:
+        conn.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+        conn.execute("PRAGMA archive.journal_mode = WAL")
+        conn.execute("PRAGMA archive.synchronous = NORMAL")
+        for statement in ARCHIVE_SCHEMA:
+            conn.execute(statement)
+        while True:
+            # Oldest first, on idx_orders_date
+            order_ids = [row[0] for row in conn.execute(
+                "SELECT order_id FROM main.orders WHERE order_date < ? ORDER BY order_date, order_id LIMIT ?",
+                (cutoff, batch_size),
+            )]
+            if not order_ids:
+                break
+            placeholders = ",".join("?" * len(order_ids))
+
+            conn.execute("BEGIN")
+            try:
+                conn.execute(
+                    "INSERT OR IGNORE INTO archive.orders "
+                    "SELECT order_id, user_id, order_date, total_amount, payment_status FROM main.orders "
+                    f"WHERE order_id IN ({placeholders})", order_ids)
+                conn.execute(
+                    "INSERT OR IGNORE INTO archive.order_items "
+                    "SELECT id, order_id, product_id, quantity, price_each FROM main.order_items "
+                    f"WHERE order_id IN ({placeholders})", order_ids)
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+            locked = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Only what the archive really holds
+                archived = [row[0] for row in conn.execute(
+                    f"SELECT order_id FROM archive.orders WHERE order_id IN ({placeholders})", order_ids)]
+                held = ",".join("?" * len(archived))
+                conn.execute(f"""
+                    INSERT INTO main.archived_sales (product_id, total_quantity, total_sales)
+                    SELECT product_id, SUM(quantity), SUM(quantity * price_each)
+                    FROM main.order_items WHERE order_id IN ({held})
+                    GROUP BY product_id
+                    ON CONFLICT(product_id) DO UPDATE SET
+                        total_quantity = total_quantity + excluded.total_quantity,
+                        total_sales = total_sales + excluded.total_sales
+                """, archived)
+                lines = conn.execute(
+                    f"DELETE FROM main.order_items WHERE order_id IN ({held})", archived).rowcount
+                conn.execute(f"DELETE FROM main.orders WHERE order_id IN ({held})", archived)
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+            locked = time.perf_counter() - locked
+            # Checkpoint the pages this batch wrote here, so the commit of a
+            # checkout is not the one that crosses wal_autocheckpoint and has
+            # to write them back
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+
+            result.orders += len(archived)
+            result.lines += lines
+            result.batches += 1
+            if progress is not None:
+                progress(result)
+            if len(archived) < len(order_ids):
+                # The copy did not take; do not spin on the same rows
+                raise sqlite3.DatabaseError("Archive copy is missing orders; not deleting them.")
+            # Leave the write lock free at least as long as the batch held
+            # it: a checkout waiting in SQLite's busy handler sleeps in
+            # growing steps and would keep missing a short gap
+            time.sleep(max(pause, locked))
+    finally:
+        conn.close()
+    return result
+
+
+def incremental_vacuum(db_path, pages=512, pause=0.01):
+    # Hands free pages back to the file system, `pages` per write
+    # transaction, until the free list is empty. Returns the number of pages
+    # freed. Needs auto_vacuum = INCREMENTAL (new databases have it; see
+    # enable_incremental_vacuum for older ones).
+    conn = _connect(db_path)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            raise ValueError("Incremental vacuum is not enabled for this database.")
+        freed = 0
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        while free:
+            # execute() would step the pragma once, freeing a single page;
+            # executescript() runs it to completion
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+            remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if remaining >= free:
+                break
+            freed += free - remaining
+            free = remaining
+            time.sleep(pause)
+        # The file only shrinks once the WAL is checkpointed; PASSIVE does
+        # what it can without waiting for readers or writers
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        return freed
+    finally:
+        conn.close()
+
+
+def enable_incremental_vacuum(db_path):
+    # One-off conversion of a database created before auto_vacuum was set.
+    # This is a full VACUUM: it rewrites the file and holds the write lock
+    # throughout, so run it while nothing else uses the database.
+    conn = _connect(db_path)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+    finally:
+        conn.close()
@@ -0,0 +1,200 @@
+# Command-line maintenance for retail.db, usable without starting the GUI.
+#
+#   python manage.py rebuild-summary [--db retail.db]
+#   python manage.py migrate
+#   python manage.py check-plans [--live]
+#   python manage.py import-products FILE.csv|FILE.jsonl [--batch-size N]
+#   python manage.py export TABLE FILE.csv|FILE.jsonl
+#   python manage.py release-reservations
+#   python manage.py replenish FILE.csv|FILE.jsonl
+#   python manage.py low-stock
+#   python manage.py backup FILE.db
+#   python manage.py archive ARCHIVE.db (--before YYYY-MM-DD | --older-than DAYS)
+#   python manage.py vacuum [--enable]
+#
+# --profile prints the statements the command ran, slowest total first, with
+# the query plans of any that took longer than --slow-ms.
+import argparse
+import datetime
+import sys
+import time
+
+from catalog_io import EXPORT_TABLES, export_table, import_products, iter_records
+
+from maintenance import archive_orders, backup, enable_incremental_vacuum, incremental_vacuum
+from migrations import analyze, check_query_plans, schema_version
+from profiling import QueryProfiler
+from retail_db import DEFAULT_DB_PATH, RetailStore
+
+
+def cmd_rebuild_summary(store, args):
+    store.orders.rebuild_sales_summary()
+    rows = store.pool.connection().execute("SELECT COUNT(*) FROM product_sales_summary").fetchone()[0]
+    print(f"Rebuilt product_sales_summary ({rows} products with sales).")
+
+
+def cmd_migrate(store, args):
+    # RetailStore already migrated on open; this reports where it ended up
+    conn = store.pool.connection()
+    analyze(conn)
+    print(f"Schema at version {schema_version(conn)}.")
+
+
+def cmd_check_plans(store, args):
+    failures = check_query_plans(store.pool.connection() if args.live else None)
+    for name, plan in failures:
+        print(f"FAIL {name}: " + "; ".join(plan))
+    if failures:
+        sys.exit(1)
+    print("All hot queries use their indexes.")
+
+
+def cmd_import_products(store, args):
+    start = time.perf_counter()
+
+    def progress(processed, imported, rejected):
+        print(f"  {processed} read, {imported} imported, {rejected} rejected", flush=True)
+
+    result = import_products(store.pool, iter_records(args.file), batch_size=args.batch_size,
+                             progress=progress)
+    for number, message in result.errors:
+        print(f"  record {number}: {message}")
+    if result.rejected > len(result.errors):
+        print(f"  ... {result.rejected - len(result.errors)} more rejected records")
+    print(f"Imported {result.imported} products, rejected {result.rejected} "
+          f"in {time.perf_counter() - start:.1f}s.")
+
+
+def cmd_export(store, args):
+    count = export_table(store.pool, args.table, args.file)
+    print(f"Exported {count} {args.table} rows to {args.file}.")
+
+
+def cmd_release_reservations(store, args):
+    released = store.carts.release_expired()
+    print(f"Released expired cart reservations for {released} products.")
+
+
+def cmd_replenish(store, args):
+    # Records with product_id and quantity columns; the whole file is applied
+    # as one transaction
+    start = time.perf_counter()
+    deltas = []
+    for number, record in enumerate(iter_records(args.file), 1):
+        try:
+            deltas.append((int(record["product_id"]), int(record["quantity"])))
+        except (KeyError, TypeError, ValueError):
+            sys.exit(f"record {number}: expected integer product_id and quantity")
+    rejected = store.inventory.replenish(deltas)
+    for pid, stock in sorted(rejected.items()):
+        print(f"  product {pid}: " + ("no such product" if stock is None else f"only {stock} in stock"))
+    products = len({pid for pid, _ in deltas})
+    print(f"Restocked {products - len(rejected)} products from {len(deltas)} lines, "
+          f"rejected {len(rejected)} in {time.perf_counter() - start:.1f}s.")
+
+
+def cmd_low_stock(store, args):
+    alerts = store.stock_alerts.poll()
+    for pid, name, stock, threshold in alerts:
+        print(f"  {pid:8d}  {stock:6d} / {threshold:<6d} {name}")
+    print(f"{len(alerts)} products at or below their low-stock threshold.")
+
+
+def cmd_backup(store, args):
+    start = time.perf_counter()
+    pages = backup(store.pool.db_path, args.file, pages=args.pages)
+    print(f"Backed up {pages} pages to {args.file} in {time.perf_counter() - start:.1f}s.")
+
+
+def cmd_archive(store, args):
+    if args.before is not None:
+        cutoff = datetime.date.fromisoformat(args.before)
+    else:
+        cutoff = datetime.date.today() - datetime.timedelta(days=args.older_than)
+    start = time.perf_counter()
+
+    def progress(result):
+        if result.batches % 20 == 0:
+            print(f"  {result.orders} orders, {result.lines} lines", flush=True)
+
+    result = archive_orders(store.pool.db_path, args.file, cutoff, batch_size=args.batch_size, progress=progress)
+    print(f"Archived {result.orders} orders ({result.lines} lines) dated before {cutoff} to {args.file} "
+          f"in {time.perf_counter() - start:.1f}s.")
+
+
+def cmd_vacuum(store, args):
+    if args.enable and enable_incremental_vacuum(store.pool.db_path):
+        print("Enabled incremental vacuum (database rewritten).")
+    pages = incremental_vacuum(store.pool.db_path)
+    print(f"Freed {pages} pages.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Online retail database maintenance")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="database file (default: retail.db)")
+    parser.add_argument("--profile", action="store_true", help="report statement timings when done")
+    parser.add_argument("--slow-ms", type=float, default=100, help="slow query threshold for --profile")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-summary", help="recompute product_sales_summary from order_items")
+    rebuild.set_defaults(func=cmd_rebuild_summary)
+
+    migrate = commands.add_parser("migrate", help="apply pending schema migrations and ANALYZE")
+    migrate.set_defaults(func=cmd_migrate)
+
+    check_plans = commands.add_parser("check-plans", help="verify hot queries use their indexes")
+    check_plans.add_argument("--live", action="store_true",
+                             help="check against the data in --db instead of a fresh schema")
+    check_plans.set_defaults(func=cmd_check_plans)
+
+    import_cmd = commands.add_parser("import-products", help="stream products from CSV/JSONL and upsert them")
+    import_cmd.add_argument("file")
+    import_cmd.add_argument("--batch-size", type=int, default=10000)
+    import_cmd.set_defaults(func=cmd_import_products)
+
+    export_cmd = commands.add_parser("export", help="stream a table to CSV/JSONL")
+    export_cmd.add_argument("table", choices=sorted(EXPORT_TABLES))
+    export_cmd.add_argument("file")
+    export_cmd.set_defaults(func=cmd_export)
+
+    release = commands.add_parser("release-reservations", help="return stock held by expired cart lines")
+    release.set_defaults(func=cmd_release_reservations)
+
+    replenish = commands.add_parser("replenish", help="apply restock deltas from CSV/JSONL in one transaction")
+    replenish.add_argument("file")
+    replenish.set_defaults(func=cmd_replenish)
+
+    low_stock = commands.add_parser("low-stock", help="list products at or below their low-stock threshold")
+    low_stock.set_defaults(func=cmd_low_stock)
+
+    backup_cmd = commands.add_parser("backup", help="online copy of the database, a few pages at a time")
+    backup_cmd.add_argument("file")
+    backup_cmd.add_argument("--pages", type=int, default=256, help="pages copied per step")
+    backup_cmd.set_defaults(func=cmd_backup)
+
+    archive = commands.add_parser("archive", help="move old orders into an archive database")
+    archive.add_argument("file", help="archive database (created if missing)")
+    cutoff = archive.add_mutually_exclusive_group(required=True)
+    cutoff.add_argument("--before", metavar="YYYY-MM-DD", help="archive orders dated before this day")
+    cutoff.add_argument("--older-than", type=int, metavar="DAYS", help="archive orders older than this")
+    archive.add_argument("--batch-size", type=int, default=200, help="orders moved per transaction")
+    archive.set_defaults(func=cmd_archive)
+
+    vacuum = commands.add_parser("vacuum", help="return free pages to the file system, in small steps")
+    vacuum.add_argument("--enable", action="store_true",
+                        help="first convert a database created without incremental vacuum (full VACUUM)")
+    vacuum.set_defaults(func=cmd_vacuum)
+
+    args = parser.parse_args(argv)
+    profiler = QueryProfiler(slow_ms=args.slow_ms) if args.profile else None
+    store = RetailStore(args.db, profiler=profiler)
+    try:
+        args.func(store, args)
+    finally:
+        store.close()
+        if profiler is not None:
+            print(profiler.report(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
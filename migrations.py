@@ -0,0 +1,423 @@
+# Versioned schema migrations for retail.db.
+#
+# The schema version lives in PRAGMA user_version. Each entry in MIGRATIONS
+# moves the database from version N-1 to N inside one transaction, so a
+# database is never left half-migrated. Databases created before versioning
+# (user_version 0) already have the base tables; migration 1 uses
+# CREATE ... IF NOT EXISTS so it is a no-op for them.
+import sqlite3
+
+
+def summarize_order_items(conn):
+    # The summary as first introduced, from order_items alone
+    conn.execute("DELETE FROM product_sales_summary")
+    conn.execute("""
+        INSERT INTO product_sales_summary (product_id, total_quantity, total_sales)
+        SELECT product_id, SUM(quantity), SUM(quantity * price_each)
+        FROM order_items
+        GROUP BY product_id
+    """)
+
+
+def rebuild_sales_summary(conn):
+    # order_items plus the totals of lines moved to the archive
+    conn.execute("DELETE FROM product_sales_summary")
+    conn.execute("""
+        INSERT INTO product_sales_summary (product_id, total_quantity, total_sales)
+        SELECT product_id, SUM(quantity), SUM(sales)
+        FROM (
+            SELECT product_id, quantity, quantity * price_each AS sales FROM order_items
+            UNION ALL
+            SELECT product_id, total_quantity, total_sales FROM archived_sales
+        )
+        GROUP BY product_id
+    """)
+
+
+MIGRATIONS = [
+    (1, "base tables", [
+        # Users: user_id (PK), username, password, role ('admin' or 'customer')
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL CHECK(role IN ('admin', 'customer'))
+        )
+        """,
+        # Products: product_id (PK), name, price, stock_quantity
+        """
+        CREATE TABLE IF NOT EXISTS products (
+            product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            price REAL NOT NULL,
+            stock_quantity INTEGER NOT NULL
+        )
+        """,
+        # Orders: order_id (PK), user_id (FK), order_date, total_amount, payment_status
+        """
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            order_date TEXT NOT NULL,
+            total_amount REAL NOT NULL,
+            payment_status TEXT NOT NULL CHECK(payment_status IN ('paid', 'pending')),
+            FOREIGN KEY(user_id) REFERENCES users(user_id)
+        )
+        """,
+        # OrderItems: id (PK), order_id (FK), product_id (FK), quantity, price_each
+        """
+        CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            price_each REAL NOT NULL,
+            FOREIGN KEY(order_id) REFERENCES orders(order_id),
+            FOREIGN KEY(product_id) REFERENCES products(product_id)
+        )
+        """,
+    ]),
+    (2, "product sales summary", [
+        # ProductSalesSummary: running sales totals per product, kept current
+        # by the trigger so the admin statistics never scan order_items
+        """
+        CREATE TABLE IF NOT EXISTS product_sales_summary (
+            product_id INTEGER PRIMARY KEY,
+            total_quantity INTEGER NOT NULL DEFAULT 0,
+            total_sales REAL NOT NULL DEFAULT 0,
+            FOREIGN KEY(product_id) REFERENCES products(product_id)
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS order_items_sales_summary
+        AFTER INSERT ON order_items
+        BEGIN
+            INSERT INTO product_sales_summary (product_id, total_quantity, total_sales)
+            VALUES (NEW.product_id, NEW.quantity, NEW.quantity * NEW.price_each)
+            ON CONFLICT(product_id) DO UPDATE SET
+                total_quantity = total_quantity + excluded.total_quantity,
+                total_sales = total_sales + excluded.total_sales;
+        END
+        """,
+        # Seed the summary from orders placed before it existed
+        summarize_order_items,
+    ]),
+    (3, "secondary indexes", [
+        # Per-product sales aggregates (summary rebuild, stats joins):
+        # covering, so SUM(quantity * price_each) never touches the table
+        """
+        CREATE INDEX IF NOT EXISTS idx_order_items_product
+        ON order_items (product_id, quantity, price_each)
+        """,
+        # Lines of a given order
+        """
+        CREATE INDEX IF NOT EXISTS idx_order_items_order
+        ON order_items (order_id, product_id, quantity, price_each)
+        """,
+        # A customer's orders, newest first
+        """
+        CREATE INDEX IF NOT EXISTS idx_orders_user_date
+        ON orders (user_id, order_date, order_id)
+        """,
+        # Date-range reporting
+        """
+        CREATE INDEX IF NOT EXISTS idx_orders_date
+        ON orders (order_date)
+        """,
+    ]),
+    (4, "product full-text search", [
+        # External-content FTS5 index over the product name. Description or
+        # category columns can be added here (and to the triggers) when the
+        # products table grows them. prefix='2 3' keeps short as-you-type
+        # prefixes on an index lookup.
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            name,
+            content='products',
+            content_rowid='product_id',
+            prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS products_fts_insert
+        AFTER INSERT ON products
+        BEGIN
+            INSERT INTO products_fts (rowid, name) VALUES (NEW.product_id, NEW.name);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS products_fts_delete
+        AFTER DELETE ON products
+        BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name) VALUES ('delete', OLD.product_id, OLD.name);
+        END
+        """,
+        # Only name changes touch the index; stock updates at checkout do not
+        """
+        CREATE TRIGGER IF NOT EXISTS products_fts_update
+        AFTER UPDATE OF name ON products
+        BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name) VALUES ('delete', OLD.product_id, OLD.name);
+            INSERT INTO products_fts (rowid, name) VALUES (NEW.product_id, NEW.name);
+        END
+        """,
+        "INSERT INTO products_fts (products_fts) VALUES ('rebuild')",
+    ]),
+    (5, "carts and stock reservations", [
+        # Carts: one open cart per customer
+        """
+        CREATE TABLE IF NOT EXISTS carts (
+            cart_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL UNIQUE,
+            updated_at TEXT NOT NULL,
+            FOREIGN KEY(user_id) REFERENCES users(user_id)
+        )
+        """,
+        # CartItems: the quantity is already taken out of
+        # products.stock_quantity; reserved_until (unix time) is when the
+        # sweeper may hand it back
+        """
+        CREATE TABLE IF NOT EXISTS cart_items (
+            cart_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL CHECK(quantity > 0),
+            price_each REAL NOT NULL,
+            reserved_until REAL NOT NULL,
+            PRIMARY KEY(cart_id, product_id),
+            FOREIGN KEY(cart_id) REFERENCES carts(cart_id),
+            FOREIGN KEY(product_id) REFERENCES products(product_id)
+        ) WITHOUT ROWID
+        """,
+        # Expired reservations, for the sweeper
+        """
+        CREATE INDEX IF NOT EXISTS idx_cart_items_expiry
+        ON cart_items (reserved_until, product_id, quantity)
+        """,
+    ]),
+    (6, "shared login sessions", [
+        # Sessions: login tokens valid in every process serving retail.db.
+        # Only a SHA-256 of the token is stored.
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            token_hash TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            role TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            FOREIGN KEY(user_id) REFERENCES users(user_id)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_sessions_expiry
+        ON sessions (expires_at)
+        """,
+    ]),
+    (7, "inventory event log", [
+        # InventoryEvents: append-only ledger of stock changes, written by the
+        # triggers below in the same transaction as the change itself. Kept
+        # small for insert speed: integer columns only, rowid order is time
+        # order, and no secondary index to maintain (consumers read by
+        # event_id range).
+        """
+        CREATE TABLE IF NOT EXISTS inventory_events (
+            event_id INTEGER PRIMARY KEY,
+            product_id INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            stock_after INTEGER NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+        """,
+        # StockThresholds: per-product low-stock level; products without a
+        # row use the monitor's default
+        """
+        CREATE TABLE IF NOT EXISTS stock_thresholds (
+            product_id INTEGER PRIMARY KEY,
+            threshold INTEGER NOT NULL CHECK(threshold >= 0),
+            FOREIGN KEY(product_id) REFERENCES products(product_id)
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS products_inventory_insert
+        AFTER INSERT ON products
+        WHEN NEW.stock_quantity <> 0
+        BEGIN
+            INSERT INTO inventory_events (product_id, delta, stock_after, created_at)
+            VALUES (NEW.product_id, NEW.stock_quantity, NEW.stock_quantity, CAST(strftime('%s', 'now') AS INTEGER));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS products_inventory_update
+        AFTER UPDATE OF stock_quantity ON products
+        WHEN NEW.stock_quantity <> OLD.stock_quantity
+        BEGIN
+            INSERT INTO inventory_events (product_id, delta, stock_after, created_at)
+            VALUES (NEW.product_id, NEW.stock_quantity - OLD.stock_quantity, NEW.stock_quantity,
+                    CAST(strftime('%s', 'now') AS INTEGER));
+        END
+        """,
+        # A threshold change is logged as a zero-delta event so every
+        # process's monitor re-evaluates the product
+        """
+        CREATE TRIGGER IF NOT EXISTS stock_thresholds_insert
+        AFTER INSERT ON stock_thresholds
+        BEGIN
+            INSERT INTO inventory_events (product_id, delta, stock_after, created_at)
+            SELECT product_id, 0, stock_quantity, CAST(strftime('%s', 'now') AS INTEGER)
+            FROM products WHERE product_id = NEW.product_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS stock_thresholds_update
+        AFTER UPDATE ON stock_thresholds
+        BEGIN
+            INSERT INTO inventory_events (product_id, delta, stock_after, created_at)
+            SELECT product_id, 0, stock_quantity, CAST(strftime('%s', 'now') AS INTEGER)
+            FROM products WHERE product_id = NEW.product_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS stock_thresholds_delete
+        AFTER DELETE ON stock_thresholds
+        BEGIN
+            INSERT INTO inventory_events (product_id, delta, stock_after, created_at)
+            SELECT product_id, 0, stock_quantity, CAST(strftime('%s', 'now') AS INTEGER)
+            FROM products WHERE product_id = OLD.product_id;
+        END
+        """,
+        # Opening balance for stock that predates the ledger
+        """
+        INSERT INTO inventory_events (product_id, delta, stock_after, created_at)
+        SELECT product_id, stock_quantity, stock_quantity, CAST(strftime('%s', 'now') AS INTEGER)
+        FROM products WHERE stock_quantity <> 0
+        """,
+    ]),
+    (8, "archived sales totals", [
+        # ArchivedSales: per-product totals of the order lines moved out by
+        # maintenance.archive_orders, so the sales summary can still be
+        # rebuilt from this database alone
+        """
+        CREATE TABLE IF NOT EXISTS archived_sales (
+            product_id INTEGER PRIMARY KEY,
+            total_quantity INTEGER NOT NULL DEFAULT 0,
+            total_sales REAL NOT NULL DEFAULT 0,
+            FOREIGN KEY(product_id) REFERENCES products(product_id)
+        )
+        """,
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    # Applies pending migrations and returns the list of versions applied.
+    # conn must be in autocommit mode (isolation_level=None).
+    applied = []
+    for version, _description, steps in MIGRATIONS:
+        if version > target:
+            break
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-read under the write lock: another process may have migrated
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        applied.append(version)
+    if applied:
+        # Fresh statistics so the planner picks up the new indexes
+        analyze(conn)
+    return applied
+
+
+def analyze(conn):
+    # ANALYZE the regular tables only. Statistics taken while the FTS5
+    # shadow tables are nearly empty make FTS5's internal lookups plan as
+    # scans, which slows every later product insert several times over.
+    tables = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' "
+        "AND name NOT LIKE 'sqlite_%' AND name NOT LIKE '%_fts%'"
+    ).fetchall()
+    for (name,) in tables:
+        conn.execute(f'ANALYZE "{name}"')
+
+
+# Hot queries and the index each must use. check_query_plans() runs
+# EXPLAIN QUERY PLAN over them so a dropped or shadowed index shows up as a
+# failure instead of a slow admin screen.
+HOT_QUERIES = [
+    (
+        "sales by product",
+        "SELECT product_id, SUM(quantity), SUM(quantity * price_each) "
+        "FROM order_items GROUP BY product_id",
+        (),
+        "idx_order_items_product",
+    ),
+    (
+        "order lines",
+        "SELECT product_id, quantity, price_each FROM order_items WHERE order_id = ?",
+        (1,),
+        "idx_order_items_order",
+    ),
+    (
+        "orders of a user",
+        "SELECT order_id, order_date, total_amount FROM orders "
+        "WHERE user_id = ? ORDER BY order_date DESC, order_id DESC",
+        (1,),
+        "idx_orders_user_date",
+    ),
+    (
+        "order history page",
+        "SELECT order_id, order_date, total_amount, payment_status FROM orders "
+        "WHERE user_id = ? AND (order_date, order_id) < (?, ?) "
+        "ORDER BY order_date DESC, order_id DESC LIMIT ?",
+        (1, "2025-01-01", 1, 20),
+        "idx_orders_user_date",
+    ),
+    (
+        "orders in a date range",
+        "SELECT order_id FROM orders WHERE order_date >= ? AND order_date < ?",
+        ("2024-01-01", "2025-01-01"),
+        "idx_orders_date",
+    ),
+    (
+        "expired reservations",
+        "SELECT product_id, SUM(quantity) FROM cart_items WHERE reserved_until < ? GROUP BY product_id",
+        (0,),
+        "idx_cart_items_expiry",
+    ),
+]
+
+
+def explain(conn, sql, params=()):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def check_query_plans(conn=None):
+    # Returns (name, plan) for every hot query that does not use its index.
+    # Without a connection the check runs against a freshly migrated
+    # in-memory schema, which is independent of the data in retail.db; on a
+    # live database with tiny tables the planner may rightly prefer a scan.
+    if conn is None:
+        conn = sqlite3.connect(":memory:", isolation_level=None)
+        migrate(conn)
+    failures = []
+    for name, sql, params, index in HOT_QUERIES:
+        plan = explain(conn, sql, params)
+        if not any(index in detail for detail in plan):
+            failures.append((name, plan))
+    return failures
@@ -0,0 +1,267 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(\s*,\s*\?)*\s*\)", re.IGNORECASE)
+
+
+def normalize_sql(sql):
+    # One entry per statement shape: whitespace collapsed, and IN (?, ?, ...)
+    # lists of any length folded together
+    return _IN_LIST.sub("IN (?, ...)", _WHITESPACE.sub(" ", sql).strip())
+
+
+class StatementStats:
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.vm_steps = 0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def add(self, elapsed_ms, rows, vm_steps):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += rows
+        self.vm_steps += vm_steps
+        for index, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if elapsed_ms <= bound:
+                break
+        else:
+            index = len(HISTOGRAM_BOUNDS_MS)
+        self.histogram[index] += 1
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.calls if self.calls else 0.0
+
+    def percentile_ms(self, p):
+        # Upper bound of the bucket holding the p-th call, capped at the
+        # slowest call actually seen
+        target = p * self.calls
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= target:
+                if index < len(HISTOGRAM_BOUNDS_MS):
+                    return min(HISTOGRAM_BOUNDS_MS[index], self.max_ms)
+                return self.max_ms
+        return 0.0
+
+
+class SlowQuery:
+    def __init__(self, sql, elapsed_ms, rows, plan, when):
+        self.sql = sql
+        self.elapsed_ms = elapsed_ms
+        self.rows = rows
+        self.plan = plan
+        self.when = when
+
+
+class QueryProfiler:
+    # Per-statement timings for every connection of a ConnectionPool created
+    # with profiler=QueryProfiler().
+    #
+    # A statement is timed from execute() until its rows are exhausted (or
+    # its cursor is closed or reused), so fetch time counts. Statements slower
+    # than slow_ms go to the slow-query log together with their EXPLAIN QUERY
+    # PLAN, captured once per statement shape.
+    #
+    # Optional SQLite hooks, both off by default because they cost on every
+    # statement:
+    #   trace:          callable receiving each SQL string SQLite runs,
+    #                   including trigger bodies (set_trace_callback)
+    #   progress_steps: count VM instructions per statement in units of this
+    #                   many steps (set_progress_handler); a rough measure of
+    #                   work done that is independent of machine load
+    def __init__(self, slow_ms=100, max_slow=200, trace=None, progress_steps=0):
+        self.slow_ms = slow_ms
+        self.trace = trace
+        self.progress_steps = progress_steps
+        self.enabled = True
+        self.stats = {}
+        self.slow = deque(maxlen=max_slow)
+        self.plans = {}
+        self._lock = threading.Lock()
+
+    def attach(self, conn):
+        conn.profiler = self
+        conn.vm_ticks = 0
+        if self.trace is not None:
+            conn.set_trace_callback(self.trace)
+        if self.progress_steps:
+            def tick():
+                conn.vm_ticks += 1
+                return 0
+            conn.set_progress_handler(tick, self.progress_steps)
+
+    def record(self, conn, sql, elapsed, rows, ticks, parameters=None):
+        key = normalize_sql(sql)
+        elapsed_ms = elapsed * 1000
+        with self._lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = StatementStats(key)
+            stats.add(elapsed_ms, rows, ticks * self.progress_steps)
+            is_slow = elapsed_ms >= self.slow_ms
+            plan = self.plans.get(key) if is_slow else None
+        if not is_slow:
+            return
+        if plan is None:
+            plan = self._explain(conn, sql, parameters)
+            with self._lock:
+                self.plans[key] = plan
+        with self._lock:
+            self.slow.append(SlowQuery(key, elapsed_ms, rows, plan, time.time()))
+
+    def _explain(self, conn, sql, parameters=None):
+        # With the statement's own parameters; where they are not known
+        # (executemany over an iterator) every "?" is bound to NULL, which is
+        # enough for the plan
+        words = sql.split(None, 1)
+        if not words or words[0].upper() not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE"):
+            return []
+        if parameters is None:
+            parameters = (None,) * sql.count("?")
+        try:
+            rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+        except sqlite3.Error as e:
+            return [f"(no plan: {e})"]
+        return [row[3] for row in rows]
+
+    def top(self, limit=20, key="total_ms"):
+        with self._lock:
+            stats = list(self.stats.values())
+        return sorted(stats, key=lambda s: getattr(s, key), reverse=True)[:limit]
+
+    def slow_queries(self):
+        with self._lock:
+            return list(self.slow)
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self.slow.clear()
+            self.plans.clear()
+
+    def report(self, limit=20):
+        steps = f" {'vm steps':>11}" if self.progress_steps else ""
+        lines = [f"{'calls':>8} {'total ms':>10} {'mean ms':>9} {'p95 ms':>8} {'max ms':>9} {'rows':>9}{steps}  statement"]
+        for s in self.top(limit):
+            steps = f" {s.vm_steps:11d}" if self.progress_steps else ""
+            lines.append(f"{s.calls:8d} {s.total_ms:10.1f} {s.mean_ms:9.3f} {s.percentile_ms(0.95):8.2f} "
+                         f"{s.max_ms:9.2f} {s.rows:9d}{steps}  {s.sql[:120]}")
+        slow = self.slow_queries()
+        if slow:
+            lines.append("")
+            lines.append(f"Slow queries (>= {self.slow_ms} ms), most recent last:")
+            for q in slow[-limit:]:
+                lines.append(f"  {q.elapsed_ms:9.1f} ms {q.rows:7d} rows  {q.sql[:120]}")
+                lines.extend("      " + step for step in q.plan)
+        return "\n".join(lines)
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    _sql = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        return self._timed(sql, parameters, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        # The first set stands in for all of them when the plan is explained
+        first = seq_of_parameters[0] if isinstance(seq_of_parameters, (list, tuple)) and seq_of_parameters else None
+        return self._timed(sql, first, super().executemany, sql, seq_of_parameters)
+
+    def _timed(self, sql, parameters, method, *args):
+        conn = self.connection
+        if not conn.profiler.enabled:
+            return method(*args)
+        self._sql = sql
+        self._parameters = parameters
+        self._rows = 0
+        self._ticks = conn.vm_ticks
+        self._started = time.perf_counter()
+        try:
+            method(*args)
+        except BaseException:
+            self._finish()
+            raise
+        if self.description is None:
+            # Writes and DDL are done once execute returns
+            self._rows = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def fetchone(self):
+        row = super().fetchone()
+        if self._sql is not None:
+            if row is None:
+                self._finish()
+            else:
+                self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        if self._sql is not None:
+            self._rows += len(rows)
+            if not rows:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        if self._sql is not None:
+            self._rows += len(rows)
+            self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._finish()
+            raise
+        if self._sql is not None:
+            self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+    def _finish(self):
+        sql = self._sql
+        if sql is None:
+            return
+        self._sql = None
+        conn = self.connection
+        conn.profiler.record(conn, sql, time.perf_counter() - self._started, self._rows,
+                             conn.vm_ticks - self._ticks, self._parameters)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    # Connection.execute/executemany are routed through ProfiledCursor so
+    # every statement of the repositories is timed without changing them
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,316 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from auth import AuthService, DatabaseSessions
+from carts import CartService
+from catalog_cache import CatalogCache
+from checkout import CheckoutEngine
+from inventory import InventoryService, LowStockMonitor
+from migrations import LATEST_VERSION, migrate, rebuild_sales_summary, schema_version
+from profiling import ProfiledConnection
+from search import ProductSearch
+
+DEFAULT_DB_PATH = "retail.db"
+
+
+class ConnectionPool:
+    # One connection per thread, all against the same database file. WAL mode
+    # lets readers run while a writer holds the lock, and busy_timeout makes
+    # writers wait for each other instead of failing straight away.
+    #
+    # With a profiling.QueryProfiler every statement run through the pool's
+    # connections is timed; without one the connections are plain sqlite3.
+    def __init__(self, db_path=DEFAULT_DB_PATH, busy_timeout_ms=5000, cached_statements=256,
+                 profiler=None):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self.profiler = profiler
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def _open(self):
+        # isolation_level=None: transactions are opened explicitly through
+        # transaction() so BEGIN IMMEDIATE can be used where it matters.
+        # cached_statements keeps the prepared statements of every SQL string
+        # the repositories reuse.
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=ProfiledConnection if self.profiler is not None else sqlite3.Connection,
+        )
+        if self.profiler is not None:
+            self.profiler.attach(conn)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        # Only takes effect on a new, empty file, and must come before WAL
+        # mode writes its header; lets maintenance.incremental_vacuum give
+        # space back
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self, immediate=False):
+        conn = self.connection()
+        if conn.in_transaction:
+            # Nested use joins the outer transaction
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections:
+                # Let SQLite refresh planner statistics that have drifted
+                conn.execute("PRAGMA optimize")
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+class UserRepository:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def find_by_username(self, username):
+        return self.pool.connection().execute(
+            "SELECT user_id, role, password FROM users WHERE username=?", (username,)
+        ).fetchone()
+
+    def create(self, username, password, role="customer"):
+        # Raises sqlite3.IntegrityError when the username is taken
+        with self.pool.transaction() as conn:
+            cur = conn.execute(
+                "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+                (username, password, role),
+            )
+            return cur.lastrowid
+
+    def update_password(self, user_id, new_password, old_password):
+        # Only replaces the value the caller read, so concurrent changes win
+        with self.pool.transaction() as conn:
+            cur = conn.execute(
+                "UPDATE users SET password=? WHERE user_id=? AND password=?",
+                (new_password, user_id, old_password),
+            )
+            return cur.rowcount == 1
+
+    def ensure_admin(self, username="admin", password="admin123"):
+        # Ensure admin user exists with default credentials (admin/admin123).
+        # Stored as plaintext here; AuthService rehashes it on first login.
+        # Only takes the write lock when the first read finds no admin.
+        if self.pool.connection().execute("SELECT 1 FROM users WHERE role='admin' LIMIT 1").fetchone():
+            return
+        with self.pool.transaction(immediate=True) as conn:
+            admin = conn.execute("SELECT user_id FROM users WHERE role='admin'").fetchone()
+            if not admin:
+                conn.execute(
+                    "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+                    (username, password, "admin"),
+                )
+
+
+class SessionRepository:
+    # Rows of the sessions table; tokens arrive already hashed
+    def __init__(self, pool):
+        self.pool = pool
+
+    def create(self, token_hash, user, expires_at):
+        with self.pool.transaction() as conn:
+            conn.execute(
+                "INSERT INTO sessions (token_hash, user_id, username, role, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (token_hash, user["user_id"], user["username"], user["role"], expires_at),
+            )
+
+    def find(self, token_hash, now):
+        row = self.pool.connection().execute(
+            "SELECT user_id, username, role FROM sessions WHERE token_hash = ? AND expires_at > ?",
+            (token_hash, now),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"user_id": row[0], "username": row[1], "role": row[2]}
+
+    def delete(self, token_hash):
+        with self.pool.transaction() as conn:
+            conn.execute("DELETE FROM sessions WHERE token_hash = ?", (token_hash,))
+
+    def delete_expired(self, now):
+        with self.pool.transaction() as conn:
+            return conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+
+
+class ProductRepository:
+    # add_listeners are called with the id of each product added through add()
+    def __init__(self, pool):
+        self.pool = pool
+        self.add_listeners = []
+
+    def page(self, after_id=0, limit=100):
+        # Keyset pagination: cost depends on the page size, not on how deep
+        # into the catalog the page is
+        return self.pool.connection().execute(
+            "SELECT product_id, name, price, stock_quantity FROM products "
+            "WHERE product_id > ? ORDER BY product_id LIMIT ?",
+            (after_id, limit),
+        ).fetchall()
+
+    def get_many(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return []
+        placeholders = ",".join("?" * len(product_ids))
+        return self.pool.connection().execute(
+            f"SELECT product_id, name, price, stock_quantity FROM products WHERE product_id IN ({placeholders})",
+            product_ids,
+        ).fetchall()
+
+    def add(self, name, price, stock):
+        with self.pool.transaction() as conn:
+            product_id = conn.execute(
+                "INSERT INTO products (name, price, stock_quantity) VALUES (?, ?, ?)",
+                (name, price, stock),
+            ).lastrowid
+        for listener in self.add_listeners:
+            listener(product_id)
+        return product_id
+
+    def add_defaults(self, products):
+        # Seeds an empty catalog; a read, without the write lock, otherwise
+        if self.pool.connection().execute("SELECT 1 FROM products LIMIT 1").fetchone():
+            return
+        with self.pool.transaction(immediate=True) as conn:
+            if conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 0:
+                conn.executemany(
+                    "INSERT INTO products (name, price, stock_quantity) VALUES (?, ?, ?)",
+                    products,
+                )
+
+
+class OrderRepository:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def sales_statistics(self):
+        # Total quantity sold and total sales per product, read from the
+        # summary table: one row per product whatever the order history size
+        return self.pool.connection().execute("""
+            SELECT p.product_id, p.name,
+                   IFNULL(s.total_quantity, 0) AS total_quantity,
+                   IFNULL(s.total_sales, 0) AS total_sales
+            FROM products p
+            LEFT JOIN product_sales_summary s ON s.product_id = p.product_id
+            ORDER BY total_sales DESC
+        """).fetchall()
+
+    def order_history(self, user_id, before=None, limit=20):
+        # One page of a customer's orders, newest first. Returns
+        # (orders, next_cursor): orders are (order_id, order_date,
+        # total_amount, payment_status, lines) with lines as (product_id,
+        # name, quantity, price_each); pass next_cursor back as `before` for
+        # the following page, None means there are no more.
+        #
+        # Keyset pagination on idx_orders_user_date (user_id, order_date,
+        # order_id): every page is an index seek, however many orders the
+        # account has or how deep the page is.
+        conn = self.pool.connection()
+        if before is None:
+            orders = conn.execute(
+                "SELECT order_id, order_date, total_amount, payment_status FROM orders "
+                "WHERE user_id = ? ORDER BY order_date DESC, order_id DESC LIMIT ?",
+                (user_id, limit + 1),
+            ).fetchall()
+        else:
+            orders = conn.execute(
+                "SELECT order_id, order_date, total_amount, payment_status FROM orders "
+                "WHERE user_id = ? AND (order_date, order_id) < (?, ?) "
+                "ORDER BY order_date DESC, order_id DESC LIMIT ?",
+                (user_id, before[0], before[1], limit + 1),
+            ).fetchall()
+        # The extra row only tells whether another page exists
+        has_more = len(orders) > limit
+        orders = orders[:limit]
+        if not orders:
+            return [], None
+
+        # Lines of the whole page in one query instead of one per order
+        lines = {order_id: [] for order_id, _, _, _ in orders}
+        placeholders = ",".join("?" * len(orders))
+        for order_id, product_id, name, quantity, price_each in conn.execute(
+            "SELECT oi.order_id, oi.product_id, p.name, oi.quantity, oi.price_each "
+            "FROM order_items oi JOIN products p ON p.product_id = oi.product_id "
+            f"WHERE oi.order_id IN ({placeholders}) ORDER BY oi.order_id, oi.product_id",
+            list(lines),
+        ):
+            lines[order_id].append((product_id, name, quantity, price_each))
+
+        page = [(order_id, order_date, total, status, lines[order_id])
+                for order_id, order_date, total, status in orders]
+        last = orders[-1]
+        return page, ((last[1], last[0]) if has_more else None)
+
+    def rebuild_sales_summary(self):
+        # One-shot recomputation from order_items and archived_sales, for
+        # databases created before the summary table existed or after manual
+        # edits
+        with self.pool.transaction(immediate=True) as conn:
+            rebuild_sales_summary(conn)
+
+
+class RetailStore:
+    # Entry point for the GUI and for headless callers (workers, batch jobs).
+    # Nothing here touches Tk.
+    #
+    # shared_sessions keeps login tokens in the database so that several
+    # processes serving the same file (server.py workers) accept each
+    # other's tokens; the default keeps them in this process only.
+    def __init__(self, db_path=DEFAULT_DB_PATH, shared_sessions=False, **pool_options):
+        self.pool = ConnectionPool(db_path, **pool_options)
+        self.init_schema()
+        self.users = UserRepository(self.pool)
+        self.products = ProductRepository(self.pool)
+        self.orders = OrderRepository(self.pool)
+        self.checkout = CheckoutEngine(self.pool)
+        self.carts = CartService(self.pool)
+        self.sessions = SessionRepository(self.pool)
+        self.auth = AuthService(self.users, sessions=DatabaseSessions(self.sessions) if shared_sessions else None)
+        self.search = ProductSearch(self.pool)
+        self.inventory = InventoryService(self.pool)
+        self.stock_alerts = LowStockMonitor(self.pool)
+        # Reads for browsing and the cart; kept current by the write paths
+        self.catalog = CatalogCache(self.products, db_path)
+        self.checkout.stock_listeners.append(self.catalog.stock_changed)
+        self.carts.stock_listeners.append(self.catalog.stock_changed)
+        self.inventory.stock_listeners.append(self.catalog.stock_changed)
+        self.products.add_listeners.append(self.catalog.product_added)
+
+    def init_schema(self):
+        conn = self.pool.connection()
+        if schema_version(conn) < LATEST_VERSION:
+            migrate(conn)
+
+    def close(self):
+        self.catalog.close()
+        self.pool.close_all()
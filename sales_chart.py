@@ -0,0 +1,161 @@
+import base64
+import hashlib
+import io
+import math
+import threading
+from collections import OrderedDict
+
+
+def chart_data(stats, top_n=15):
+    # (labels, sales) for the top_n products by sales, plus one "Other" bar
+    # holding everything else. stats rows are (product_id, name, quantity,
+    # sales), as returned by OrderRepository.sales_statistics.
+    ranked = sorted(stats, key=lambda row: row[3], reverse=True)
+    labels = [name if len(name) <= 18 else name[:17] + "…" for _, name, _, _ in ranked[:top_n]]
+    sales = [float(row[3]) for row in ranked[:top_n]]
+    rest = ranked[top_n:]
+    if rest:
+        labels.append(f"Other ({len(rest)})")
+        sales.append(float(sum(row[3] for row in rest)))
+    return labels, sales
+
+
+def fingerprint(*parts):
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def nice_ceiling(value):
+    # Smallest 1/2/2.5/5 x 10^k above value plus 10% headroom, so the axis
+    # (and with it the expensive full redraw) only changes when sales grow
+    # past a round number
+    if value <= 0:
+        return 1.0
+    value *= 1.1
+    magnitude = 10 ** math.floor(math.log10(value))
+    for step in (1, 2, 2.5, 5, 10):
+        if step * magnitude >= value:
+            return step * magnitude
+    return 10 * magnitude
+
+
+def money(value):
+    if value >= 1e6:
+        return f"${value / 1e6:.1f}M"
+    if value >= 1e4:
+        return f"${value / 1e3:.0f}k"
+    return f"${value:.0f}"
+
+
+class ChartImage:
+    def __init__(self, key, png):
+        self.key = key
+        self.png = png
+
+    @property
+    def photo_data(self):
+        # For tk.PhotoImage(data=...)
+        return base64.b64encode(self.png)
+
+
+class SalesChartRenderer:
+    # Draws the admin sales bar chart into PNG bytes, off the Tk thread.
+    #
+    # - At most top_n bars plus an "Other" bucket, however large the catalog.
+    # - Images are cached by a fingerprint of the bars and the pixel size, so
+    #   a refresh with the same sales returns the cached PNG without drawing.
+    # - One Figure is kept between renders. A full draw only happens when the
+    #   bar labels, their count, the y-axis ceiling or the size change;
+    #   otherwise the bars and their value labels are updated in place
+    #   (set_height) and blitted over the saved background.
+    #
+    # Safe to call from several worker threads; renders are serialized.
+    # matplotlib and PIL are imported by the first draw, not with the module.
+    def __init__(self, top_n=15, dpi=100, max_cached=32):
+        self.top_n = top_n
+        self.dpi = dpi
+        self.max_cached = max_cached
+        self.cache = OrderedDict()
+        self.full_draws = 0
+        self.blits = 0
+        self._lock = threading.Lock()
+        self._figure = None
+        self._size = None
+        self._layout = None
+
+    def render(self, stats, width=800, height=400):
+        labels, sales = chart_data(stats, self.top_n)
+        key = fingerprint(labels, sales, width, height)
+        with self._lock:
+            image = self.cache.get(key)
+            if image is not None:
+                self.cache.move_to_end(key)
+                return image
+            png = self._draw(labels, sales, width, height)
+            image = self.cache[key] = ChartImage(key, png)
+            while len(self.cache) > self.max_cached:
+                self.cache.popitem(last=False)
+            return image
+
+    def _draw(self, labels, sales, width, height):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        from PIL import Image
+
+        if self._size != (width, height):
+            self._figure = Figure(figsize=(width / self.dpi, height / self.dpi), dpi=self.dpi)
+            self._canvas = FigureCanvasAgg(self._figure)
+            self._axes = self._figure.add_subplot(111)
+            # Fixed margins instead of tight_layout() on every refresh
+            self._figure.subplots_adjust(left=0.1, right=0.98, top=0.9, bottom=0.3)
+            self._size = (width, height)
+            self._layout = None
+
+        # Scaled to the named bars; a larger "Other" bar is cut at the top
+        # and keeps its true value in its label
+        has_other = bool(labels) and labels[-1].startswith("Other (")
+        named = sales[:-1] if has_other and len(sales) > 1 else sales
+        ceiling = nice_ceiling(max(named, default=0))
+        layout = (tuple(labels), ceiling)
+        if layout != self._layout:
+            self._full_draw(labels, ceiling)
+            self._layout = layout
+        else:
+            self.blits += 1
+
+        canvas = self._canvas
+        canvas.restore_region(self._background)
+        for bar, text, value in zip(self._bars, self._texts, sales):
+            bar.set_height(min(value, ceiling))
+            text.set_y(min(value, ceiling * 0.98))
+            text.set_verticalalignment("top" if value > ceiling else "bottom")
+            text.set_text(money(value))
+            self._axes.draw_artist(bar)
+            self._axes.draw_artist(text)
+
+        buffer = io.BytesIO()
+        Image.frombuffer("RGBA", canvas.get_width_height(), canvas.buffer_rgba(), "raw", "RGBA", 0, 1) \
+            .save(buffer, "PNG", compress_level=1)
+        return buffer.getvalue()
+
+    def _full_draw(self, labels, ceiling):
+        # Axes, ticks and titles; the bars are animated artists, left out of
+        # this draw and the background saved from it
+        from matplotlib.ticker import FuncFormatter
+
+        self.full_draws += 1
+        axes = self._axes
+        axes.clear()
+        x = range(len(labels))
+        self._bars = list(axes.bar(x, [0] * len(labels), color="skyblue", animated=True))
+        if labels and labels[-1].startswith("Other ("):
+            self._bars[-1].set_color("lightgray")
+        self._texts = [axes.text(i, 0, "", ha="center", va="bottom", fontsize=8, animated=True) for i in x]
+        axes.set_title("Product Sales Performance")
+        axes.set_ylabel("Total Sales ($)")
+        axes.yaxis.set_major_formatter(FuncFormatter(lambda value, _pos: money(value)))
+        axes.set_xticks(list(x))
+        axes.set_xticklabels(labels, rotation=45, ha="right", fontsize=8)
+        axes.set_xlim(-0.6, max(len(labels), 1) - 0.4)
+        axes.set_ylim(0, ceiling)
+        self._canvas.draw()
+        self._background = self._canvas.copy_from_bbox(self._figure.bbox)
@@ -0,0 +1,36 @@
+import re
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(text):
+    # "smart wat" -> '"smart"* "wat"*': every word must match as a prefix.
+    # Quoting each token keeps FTS5 operators typed by the user inert.
+    tokens = TOKEN_RE.findall(text.lower())
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+class ProductSearch:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def search(self, text, limit=100):
+        # Best matches first (bm25 rank from the FTS5 index)
+        query = build_match_query(text)
+        if not query:
+            return []
+        return self.pool.connection().execute(
+            "SELECT p.product_id, p.name, p.price, p.stock_quantity "
+            "FROM products_fts JOIN products p ON p.product_id = products_fts.rowid "
+            "WHERE products_fts MATCH ? "
+            "ORDER BY products_fts.rank LIMIT ?",
+            (query, limit),
+        ).fetchall()
+
+    def search_like(self, text, limit=100):
+        # Unindexed substring scan, kept as the baseline for benchmarks
+        return self.pool.connection().execute(
+            "SELECT product_id, name, price, stock_quantity FROM products "
+            "WHERE name LIKE ? LIMIT ?",
+            (f"%{text}%", limit),
+        ).fetchall()
@@ -0,0 +1,479 @@
+# HTTP/JSON front end for retail.db, standard library only.
+#
+#   python server.py [--db retail.db] [--port 8080] [--workers 4] [--threads 16]
+#
+# Every worker process opens its own RetailStore on the same database file;
+# WAL lets their readers run alongside the single writer, and login sessions
+# live in the sessions table so any worker accepts any token. Within a
+# process requests are handled by a fixed pool of threads (one pooled SQLite
+# connection each); with keep-alive a thread serves one client connection at
+# a time, so give each process at least as many threads as concurrent
+# clients it should hold. --workers > 1 needs fork (Linux, macOS).
+#
+# Requests and responses are JSON; authenticated calls send
+# "Authorization: Bearer <token>" with the token returned by /api/login.
+# Order and cart lines carry no price: the store prices them from the
+# products table. limit must be at least 1 and is capped per endpoint.
+#
+#   POST /api/login              {"username", "password"} -> user + token
+#   POST /api/logout
+#   POST /api/register           {"username", "password"} -> {"user_id"}
+#   GET  /api/products           ?after=0&limit=100 | ?ids=1,2,3 | ?q=text
+#   POST /api/products           {"name", "price", "stock"}            (admin)
+#   POST /api/orders             {"items": [[product_id, quantity]]}
+#   GET  /api/orders             ?before_date=&before_id=&limit=20
+#   GET  /api/cart
+#   POST /api/cart               {"changes": [[product_id, quantity]]}
+#   POST /api/cart/checkout      {"changes": [...], "expected": [[product_id, quantity]]}
+#   GET  /api/statistics                                               (admin)
+#   GET  /api/trends             ?start=&end=&granularity=&ma_window=  (admin)
+#   GET  /api/inventory/alerts                                         (admin)
+#   POST /api/inventory/replenish  {"deltas": [[product_id, quantity]]} (admin)
+#   POST /api/inventory/thresholds {"thresholds": [[product_id, level]]} (admin)
+#   GET  /api/health
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import re
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from analytics import AnalyticsEngine
+from carts import ReservationExpiredError
+from catalog_io import parse_product
+from checkout import InsufficientStockError
+from retail_db import DEFAULT_DB_PATH, RetailStore
+
+MAX_BODY_BYTES = 1024 * 1024
+# Most product ids one ?ids= request may ask for
+MAX_IDS = 1000
+SWEEP_INTERVAL = 60
+
+
+class ApiError(Exception):
+    def __init__(self, status, code, message, **details):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.details = details
+
+
+def _int(query, name, default=None):
+    value = query.get(name, [None])[0]
+    if value in (None, ""):
+        if default is None:
+            raise ApiError(400, "bad_request", f"Missing parameter: {name}")
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(400, "bad_request", f"Parameter {name} must be an integer.")
+
+
+def _limit(query, default, most):
+    # Page size from ?limit=; SQLite reads a negative LIMIT as no limit at all
+    limit = _int(query, "limit", default)
+    if limit < 1:
+        raise ApiError(400, "bad_request", "Parameter limit must be at least 1.")
+    return min(limit, most)
+
+
+def _lines(body, name):
+    # [[product_id, quantity], ...] -> [(int, int)]; prices are always the
+    # store's own
+    try:
+        return [(int(pid), int(quantity)) for pid, quantity in body.get(name) or []]
+    except (TypeError, ValueError):
+        raise ApiError(400, "bad_request", f"{name} must be a list of [product_id, quantity].")
+
+
+class RetailApi:
+    # Transport-independent request handling: (method, path, query, body,
+    # token) in, (status, JSON-ready payload) out. The store is opened on
+    # first use so a forked worker never inherits an open SQLite connection.
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._store = None
+        self._analytics = None
+        self._lock = threading.Lock()
+        self.routes = [
+            ("GET", re.compile(r"/api/health"), self.health, None),
+            ("POST", re.compile(r"/api/login"), self.login, None),
+            ("POST", re.compile(r"/api/logout"), self.logout, None),
+            ("POST", re.compile(r"/api/register"), self.register, None),
+            ("GET", re.compile(r"/api/products"), self.products, None),
+            ("POST", re.compile(r"/api/products"), self.add_product, "admin"),
+            ("GET", re.compile(r"/api/orders"), self.order_history, "customer"),
+            ("POST", re.compile(r"/api/orders"), self.place_order, "customer"),
+            ("GET", re.compile(r"/api/cart"), self.get_cart, "customer"),
+            ("POST", re.compile(r"/api/cart"), self.update_cart, "customer"),
+            ("POST", re.compile(r"/api/cart/checkout"), self.checkout_cart, "customer"),
+            ("GET", re.compile(r"/api/statistics"), self.statistics, "admin"),
+            ("GET", re.compile(r"/api/trends"), self.trends, "admin"),
+            ("GET", re.compile(r"/api/inventory/alerts"), self.stock_alerts, "admin"),
+            ("POST", re.compile(r"/api/inventory/replenish"), self.replenish, "admin"),
+            ("POST", re.compile(r"/api/inventory/thresholds"), self.set_thresholds, "admin"),
+        ]
+
+    def _open(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    store = RetailStore(self.db_path, shared_sessions=True)
+                    self._analytics = AnalyticsEngine(store.pool)
+                    # Last, so a thread that sees the store also sees the engine
+                    self._store = store
+
+    @property
+    def store(self):
+        self._open()
+        return self._store
+
+    @property
+    def analytics(self):
+        self._open()
+        return self._analytics
+
+    def close(self):
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+            self._analytics = None
+
+    def handle(self, method, path, query, body, token):
+        allowed = False
+        for route_method, pattern, handler, role in self.routes:
+            if not pattern.fullmatch(path):
+                continue
+            allowed = True
+            if route_method != method:
+                continue
+            user = None
+            if role is not None:
+                user = self.store.auth.authenticate(token) if token else None
+                if user is None:
+                    raise ApiError(401, "unauthorized", "Log in first.")
+                if user["role"] != role:
+                    raise ApiError(403, "forbidden", "Not allowed for this account.")
+            return handler(query=query, body=body, user=user, token=token)
+        if allowed:
+            raise ApiError(405, "method_not_allowed", f"{method} is not supported here.")
+        raise ApiError(404, "not_found", f"No such endpoint: {path}")
+
+    def health(self, **_):
+        return 200, {"status": "ok", "pid": os.getpid()}
+
+    def login(self, body, **_):
+        user = self.store.auth.login(str(body.get("username", "")), str(body.get("password", "")))
+        if user is None:
+            raise ApiError(401, "invalid_credentials", "Invalid username or password.")
+        return 200, user
+
+    def logout(self, token, **_):
+        if token:
+            self.store.auth.logout(token)
+        return 200, {}
+
+    def register(self, body, **_):
+        username = str(body.get("username", "")).strip()
+        password = str(body.get("password", ""))
+        if not username or not password:
+            raise ApiError(400, "bad_request", "Username and password are required.")
+        try:
+            user_id = self.store.auth.register(username, password)
+        except sqlite3.IntegrityError:
+            raise ApiError(409, "duplicate_username", "Username already exists.")
+        return 201, {"user_id": user_id}
+
+    def products(self, query, **_):
+        # Browsing is public, like the catalog screen before login
+        if "q" in query:
+            return 200, {"products": self.store.search.search(query["q"][0], _limit(query, 100, 1000))}
+        if "ids" in query:
+            try:
+                ids = [int(pid) for pid in query["ids"][0].split(",") if pid]
+            except ValueError:
+                raise ApiError(400, "bad_request", "ids must be comma-separated integers.")
+            if len(ids) > MAX_IDS:
+                raise ApiError(400, "bad_request", f"At most {MAX_IDS} ids per request.")
+            return 200, {"products": [tuple(record) for record in self.store.catalog.get_many(ids)]}
+        page = self.store.catalog.page(_int(query, "after", 0), _limit(query, 100, 1000))
+        return 200, {"products": [tuple(record) for record in page]}
+
+    def add_product(self, body, **_):
+        try:
+            name, price, stock = parse_product(body.get("name"), body.get("price"), body.get("stock"))
+        except ValueError as e:
+            raise ApiError(400, "bad_request", str(e))
+        return 201, {"product_id": self.store.products.add(name, price, stock)}
+
+    def place_order(self, body, user, **_):
+        try:
+            order_id = self.store.checkout.place_order(user["user_id"], _lines(body, "items"))
+        except InsufficientStockError as e:
+            raise ApiError(409, "insufficient_stock", str(e), product_id=e.product_id,
+                           requested=e.requested, available=e.available)
+        except ValueError as e:
+            raise ApiError(400, "bad_request", str(e))
+        return 201, {"order_id": order_id}
+
+    def order_history(self, query, user, **_):
+        before = None
+        if query.get("before_date"):
+            before = (query["before_date"][0], _int(query, "before_id"))
+        orders, cursor = self.store.orders.order_history(user["user_id"], before, _limit(query, 20, 200))
+        return 200, {"orders": orders, "next": cursor}
+
+    def get_cart(self, user, **_):
+        return 200, {"lines": self.store.carts.get_cart(user["user_id"])}
+
+    def update_cart(self, body, user, **_):
+        changes = dict(_lines(body, "changes"))
+        try:
+            rejected = self.store.carts.apply(user["user_id"], changes)
+        except ValueError as e:
+            raise ApiError(400, "bad_request", str(e))
+        return 200, {"rejected": [[pid, available] for pid, available in rejected.items()]}
+
+    def checkout_cart(self, body, user, **_):
+        changes = dict(_lines(body, "changes"))
+        expected = body.get("expected")
+        if expected is not None:
+            try:
+                expected = {int(pid): int(quantity) for pid, quantity in expected}
+            except (TypeError, ValueError):
+                raise ApiError(400, "bad_request", "expected must be a list of [product_id, quantity].")
+        try:
+            order_id = self.store.carts.checkout(user["user_id"], changes, expected=expected)
+        except InsufficientStockError as e:
+            raise ApiError(409, "insufficient_stock", str(e), product_id=e.product_id,
+                           requested=e.requested, available=e.available)
+        except ReservationExpiredError as e:
+            raise ApiError(409, "reservation_expired", str(e), product_ids=sorted(e.product_ids))
+        except ValueError as e:
+            raise ApiError(400, "bad_request", str(e))
+        return 201, {"order_id": order_id}
+
+    def statistics(self, **_):
+        return 200, {"statistics": self.store.orders.sales_statistics()}
+
+    def trends(self, query, **_):
+        try:
+            start = datetime.date.fromisoformat(query["start"][0])
+            end = datetime.date.fromisoformat(query["end"][0])
+            report = self.analytics.report(start, end, query.get("granularity", ["day"])[0],
+                                           top_n=_int(query, "top_n", 10), ma_window=_int(query, "ma_window", 7))
+        except (KeyError, ValueError) as e:
+            raise ApiError(400, "bad_request", f"Invalid trends request: {e}")
+        return 200, {
+            "granularity": report.granularity,
+            "periods": [str(period) for period in report.periods.astype("datetime64[D]")],
+            "revenue": report.revenue.tolist(),
+            "units": report.units.tolist(),
+            "revenue_ma": report.revenue_ma.tolist(),
+            "top": report.top,
+        }
+
+    def stock_alerts(self, **_):
+        return 200, {"alerts": self.store.stock_alerts.poll()}
+
+    def replenish(self, body, **_):
+        try:
+            deltas = [(int(pid), int(quantity)) for pid, quantity in body.get("deltas") or []]
+        except (TypeError, ValueError):
+            raise ApiError(400, "bad_request", "deltas must be a list of [product_id, quantity].")
+        rejected = self.store.inventory.replenish(deltas)
+        return 200, {"rejected": [[pid, stock] for pid, stock in rejected.items()]}
+
+    def set_thresholds(self, body, **_):
+        try:
+            thresholds = {int(pid): (None if level is None else int(level))
+                          for pid, level in body.get("thresholds") or []}
+            self.store.inventory.set_thresholds(thresholds)
+        except (TypeError, ValueError) as e:
+            raise ApiError(400, "bad_request", f"thresholds must be a list of [product_id, level]: {e}")
+        return 200, {}
+
+
+class RetailRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "RetailServer/1.0"
+    # Idle keep-alive connections give their thread back after this long
+    timeout = 15
+    # Headers and body are separate writes; with Nagle on, each response
+    # would wait for the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        try:
+            body = self._read_body() if method == "POST" else {}
+            auth = self.headers.get("Authorization", "")
+            token = auth[7:].strip() if auth.startswith("Bearer ") else None
+            status, payload = self.server.api.handle(method, url.path, parse_qs(url.query), body, token)
+        except ApiError as e:
+            status, payload = e.status, dict(e.details, error=e.code, message=str(e))
+        except Exception as e:
+            self.log_error("%s %s failed: %r", method, url.path, e)
+            status, payload = 500, {"error": "internal", "message": "Internal server error."}
+        self._send(status, payload)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, "too_large", "Request body too large.")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise ApiError(400, "bad_request", "Body must be JSON.")
+        if not isinstance(body, dict):
+            raise ApiError(400, "bad_request", "Body must be a JSON object.")
+        return body
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class RetailHTTPServer(HTTPServer):
+    # Like ThreadingHTTPServer, but on a fixed pool of threads, so the number
+    # of SQLite connections (one per thread) stays bounded
+    def __init__(self, address, db_path, threads=16, verbose=False):
+        super().__init__(address, RetailRequestHandler)
+        self.api = RetailApi(db_path)
+        self.threads = threads
+        self.verbose = verbose
+        self.workers = None
+
+    def serve_forever(self, poll_interval=0.5):
+        self.workers = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="http")
+        try:
+            super().serve_forever(poll_interval)
+        finally:
+            self.workers.shutdown(wait=False, cancel_futures=True)
+            self.api.close()
+
+    def process_request(self, request, client_address):
+        self.workers.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def sweep(db_path, stop, interval=SWEEP_INTERVAL):
+    # Expired cart reservations and sessions, once for all workers
+    store = RetailStore(db_path, shared_sessions=True)
+    try:
+        while not stop.wait(interval):
+            try:
+                store.carts.release_expired()
+                store.auth.sessions.purge_expired()
+            except sqlite3.Error as e:
+                print(f"sweep failed: {e}", file=sys.stderr)
+    finally:
+        store.close()
+
+
+def _worker(server):
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        server.serve_forever()
+    except SystemExit:
+        pass
+
+
+def serve(db_path=DEFAULT_DB_PATH, host="127.0.0.1", port=8080, workers=1, threads=16, verbose=False,
+          ready=None):
+    # Migrate and seed once, before any worker opens the database
+    store = RetailStore(db_path, shared_sessions=True)
+    store.users.ensure_admin()
+    store.close()
+
+    server = RetailHTTPServer((host, port), db_path, threads=threads, verbose=verbose)
+    stop = threading.Event()
+    # Opens the database, so only once the workers exist: a child forked
+    # while this process has a SQLite connection open inherits SQLite's lock
+    # bookkeeping without the locks themselves
+    sweeper = threading.Thread(target=sweep, args=(db_path, stop), daemon=True)
+    print(f"Serving {db_path} on http://{host}:{server.server_address[1]} "
+          f"({workers} worker process(es) x {threads} threads)", flush=True)
+    if ready is not None:
+        ready(server.server_address)
+
+    if workers <= 1:
+        sweeper.start()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    else:
+        # Pre-fork: every worker accepts on the same listening socket
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=_worker, args=(server,), daemon=True) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        sweeper.start()
+        try:
+            while all(process.is_alive() for process in processes):
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
+    stop.set()
+    server.server_close()
+
+
+def _stop_on_sigterm(signum, frame):
+    # Stop cleanly on SIGTERM as on Ctrl+C
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP/JSON service for the online retail database")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="database file (default: retail.db)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--threads", type=int, default=16, help="request threads per worker")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+    signal.signal(signal.SIGTERM, _stop_on_sigterm)
+    serve(args.db, args.host, args.port, args.workers, args.threads, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+# Query-plan regression test: every hot query must keep using its index on
+# a freshly migrated schema.
+#
+#   python -m pytest tests
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from migrations import HOT_QUERIES, check_query_plans, migrate  # noqa: E402
+
+
+def test_hot_queries_use_their_indexes():
+    assert check_query_plans() == []
+
+
+def test_missing_index_is_reported():
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    migrate(conn)
+    name, _, _, index = HOT_QUERIES[0]
+    conn.execute(f"DROP INDEX {index}")
+    assert name in [failure for failure, _ in check_query_plans(conn)]
@@ -0,0 +1,140 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Task:
+    def __init__(self, executor, group, on_success, on_error):
+        self.executor = executor
+        self.group = group
+        self.on_success = on_success
+        self.on_error = on_error
+        self.future = None
+        self.connection = None
+        self.cancelled = False
+        self.done = False
+
+    def cancel(self):
+        # Callbacks of a cancelled task never run. A query that is already
+        # executing is interrupted through its connection.
+        with self.executor._lock:
+            if self.done or self.cancelled:
+                return
+            self.cancelled = True
+            if self.future is not None and not self.future.cancel() and self.connection is not None:
+                self.connection.interrupt()
+
+
+class UiExecutor:
+    # Runs blocking work (SQLite queries, password hashing) on a thread pool so
+    # the Tk mainloop never waits on it. Results are handed back through a
+    # queue that the Tk thread drains every `poll_ms`, so callbacks always run
+    # on the Tk thread and may touch widgets.
+    #
+    # Tasks can be tagged with a group; cancel_group() drops everything in a
+    # group, e.g. the reads of a screen the user is navigating away from.
+    # Writes should be submitted without a group so they always complete.
+    def __init__(self, root, pool=None, max_workers=4, poll_ms=20):
+        self.root = root
+        self.pool = pool
+        self.poll_ms = poll_ms
+        self.workers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ui-worker")
+        self.results = queue.Queue()
+        self.tasks = set()
+        self.busy_callbacks = []
+        self._last_busy = 0
+        self._lock = threading.Lock()
+        self._after_id = self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, fn, *args, on_success=None, on_error=None, group=None, **kwargs):
+        # Call from the Tk thread only
+        task = Task(self, group, on_success, on_error)
+
+        def run():
+            with self._lock:
+                if task.cancelled:
+                    return
+                if self.pool is not None:
+                    task.connection = self.pool.connection()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                outcome = (task, False, e)
+            else:
+                outcome = (task, True, result)
+            with self._lock:
+                # Past this point cancel() must not interrupt the connection,
+                # which may already be running this thread's next task
+                task.connection = None
+            self.results.put(outcome)
+
+        with self._lock:
+            self.tasks.add(task)
+            task.future = self.workers.submit(run)
+        self._notify_busy()
+        return task
+
+    def cancel_group(self, group):
+        with self._lock:
+            tasks = [task for task in self.tasks if task.group == group]
+        for task in tasks:
+            task.cancel()
+        self._reap()
+
+    def busy(self):
+        with self._lock:
+            return sum(1 for task in self.tasks if not task.cancelled)
+
+    def add_busy_callback(self, callback):
+        # callback(count) runs on the Tk thread whenever the number of
+        # outstanding tasks changes; used for loading indicators
+        self.busy_callbacks.append(callback)
+
+    def shutdown(self):
+        self.root.after_cancel(self._after_id)
+        with self._lock:
+            tasks = list(self.tasks)
+        for task in tasks:
+            if task.group is not None:
+                task.cancel()
+        self.workers.shutdown(wait=True)
+
+    def _poll(self):
+        while True:
+            try:
+                task, ok, value = self.results.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                task.done = True
+                self.tasks.discard(task)
+                cancelled = task.cancelled
+            if cancelled:
+                continue
+            callback = task.on_success if ok else task.on_error
+            try:
+                if callback is not None:
+                    callback(value)
+                elif not ok:
+                    raise value
+            except Exception as e:
+                # Same reporting as an exception in any Tk callback, without
+                # stopping the polling loop
+                self.root.report_callback_exception(type(e), e, e.__traceback__)
+        self._reap()
+        self._after_id = self.root.after(self.poll_ms, self._poll)
+
+    def _reap(self):
+        # Forget cancelled tasks that will never report back
+        with self._lock:
+            for task in [t for t in self.tasks if t.cancelled and t.future.done()]:
+                self.tasks.discard(task)
+        self._notify_busy()
+
+    def _notify_busy(self):
+        count = self.busy()
+        if count == self._last_busy:
+            return
+        self._last_busy = count
+        for callback in self.busy_callbacks:
+            callback(count)